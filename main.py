@@ -1,40 +1,188 @@
+import argparse
 import json
+import os
 import sys
 
-from src.catching import attempt_catch
-from src.pokemon import PokemonFactory, StatusEffect
-from src.utils import average_probability_of_capture, pokeball_effectiveness, \
-    analyze_health_and_capture, analyze_hp_and_capture, analyze_level_and_capture, \
-    analyze_level_and_capture_with_capture_rate, analyze_hp_and_capture_with_capture_rate, \
-    analyze_status_and_capture_with_capture_rate
+# Only the modules a subcommand needs are imported, inside the subcommand, so
+# a capture rate query does not pay for pandas, matplotlib or seaborn
 
-if __name__ == "__main__":
+
+def simulate(args):
+    # Enabled before the instrumented modules are imported, see src/instrumentation.py
+    from src import instrumentation
+    if args.profile:
+        instrumentation.enable()
+
+    from src.pokeball import load_pokeballs
+    from src.rng import CatchRNG
+    from src.runner import export_experiments, plot_experiments, run_experiments
+    from src.utils import average_probability_of_capture, pokeball_effectiveness
+
+    rng = CatchRNG(args.seed)
 
     # Ex: 1a
-    average_probability_of_capture()
-    
+    average_probability_of_capture(args.analytic, rng, args.ci_width)
+
     # Ex: 1b
-    pokeball_effectiveness()
+    pokeball_effectiveness(args.analytic, rng, args.ci_width)
 
     with open('pokemon.json', "r") as c:
-        pokemon_names = json.load(c).keys()   
+        pokemon_names = json.load(c).keys()
+
+    pokeballs = load_pokeballs('pokeball.json')
+
+    # Ex: 2a, 2b and 2c, every (analysis, pokemon, pokeball) is simulated in parallel
+    results = run_experiments(pokemon_names, pokeballs, workers=args.workers, seed=args.seed,
+                              analytic=args.analytic)
+    plot_experiments(results, pokeballs, workers=args.workers)
+    if args.export:
+        export_experiments(results, args.export)
+    if args.profile:
+        instrumentation.export(args.profile)
+
+
+def rate(args):
+    from src.catching import capture_rate
+    from src.pokeball import load_pokeballs
+    from src.pokemon import PokemonFactory, StatusEffect
+
+    load_pokeballs(args.pokeball_file)
+    status = StatusEffect[args.status.upper()]
+    if args.lookup_tables is not None:
+        from src.lookup import lookup_capture_rate
+        hp_percentage = round(args.hp * 100)
+        if hp_percentage / 100 != args.hp:
+            raise ValueError("with --lookup-tables hp has to be a whole percentage, e.g. 0.57")
+        print(lookup_capture_rate(args.pokemon, args.pokeball, args.level, hp_percentage, status,
+                                  args.lookup_tables, args.pokemon_file))
+        return
+    pokemon = PokemonFactory(args.pokemon_file).create(args.pokemon, args.level, status, args.hp)
+    print(capture_rate(pokemon, args.pokeball))
+
+
+def serve(args):
+    from src.service import serve as serve_rates
+    serve_rates(args.host, args.port, args.unix, args.pokemon_file, args.pokeball_file,
+                args.max_batch, args.max_delay_ms / 1000)
+
+
+def bulk(args):
+    from src.bulk import process_queries
+    process_queries(args.input, args.output, args.batch_size, args.pokemon_file, args.pokeball_file)
+
 
-    with open('pokeball.json', "r") as c:
-        pokeballs = json.load(c).keys()
-    
-    factory = PokemonFactory("pokemon.json")
+# Ex: 2d and 2e, the generator and the visualizer keep their own arguments
+def generate(argv):
+    from utils.all_combination_of_properties_generator import main as generate_main
+    generate_main(argv)
 
-    for pokemon in pokemon_names:
-        # Ex: 2a
-        analyze_health_and_capture(factory, pokeballs, pokemon)
-        # Ex: 2b
-        analyze_hp_and_capture(factory, pokeballs, pokemon)
 
-    # Ex: 2c
-    analyze_level_and_capture(factory, pokeballs, pokemon_names)
-    analyze_level_and_capture_with_capture_rate(factory, pokeballs, pokemon_names)
-    analyze_hp_and_capture_with_capture_rate(factory, pokeballs, pokemon_names)
-    analyze_status_and_capture_with_capture_rate(factory, pokeballs, pokemon_names)
+def visualize(argv):
+    from visualize_best_combination_of_properties_per_ball import main as visualize_main
+    visualize_main(argv)
 
-    # Ex: 2d and 2e are in ./all_combination_of_properties_generator.py and ./visualize_best_combination_of_properties.py
 
+COMMANDS = ["simulate", "rate", "serve", "bulk", "generate", "visualize"]
+
+
+def _is_simulate_argument(argument):
+    if argument in COMMANDS:
+        return False
+    return argument.startswith("-") or argument.endswith(".json") or os.path.isfile(argument)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        epilog="Without a subcommand the simulate subcommand is run. Like previous versions it takes an "
+               "optional config file, an existing file or a .json one, which is ignored: "
+               "python main.py [config_file]")
+    subcommands = parser.add_subparsers(dest="command", metavar="{simulate,rate,serve,bulk,generate,visualize}")
+
+    simulate_parser = subcommands.add_parser("simulate", help="run the 1a-2c analyses and draw their graphs")
+    simulate_parser.add_argument("config_file", nargs="?", default=None,
+                                 help="ignored, accepted for compatibility with previous versions")
+    simulate_parser.add_argument("--analytic", action="store_true",
+                                 help="use the exact capture probability instead of sampling throws")
+    simulate_parser.add_argument("--ci-width", type=float, default=None,
+                                 help="in 1a and 1b stop throwing once the 95%% confidence interval is this wide")
+    simulate_parser.add_argument("--workers", type=int, default=None,
+                                 help="number of processes for the 2a-2c analyses and their graphs (default: one per CPU)")
+    simulate_parser.add_argument("--seed", type=int, default=42,
+                                 help="root seed of the simulations, the 2a-2c results do not depend on --workers")
+    simulate_parser.add_argument("--export", choices=["csv", "parquet"], default=None,
+                                 help="also save the 2a-2c results to ./results in this format")
+    simulate_parser.add_argument("--profile", default=None, metavar="PATH",
+                                 help="count calls and time of the hot paths and save them to PATH, "
+                                      "as Prometheus text if it ends in .prom and JSON otherwise")
+
+    rate_parser = subcommands.add_parser("rate", help="print the capture rate of a single throw, without noise")
+    rate_parser.add_argument("pokemon")
+    rate_parser.add_argument("pokeball")
+    rate_parser.add_argument("--level", type=int, default=100)
+    rate_parser.add_argument("--status", default="none",
+                             choices=["none", "poison", "burn", "paralysis", "sleep", "freeze"])
+    rate_parser.add_argument("--hp", type=float, default=1.0, help="remaining hp, between 0 and 1 (default: 1)")
+    rate_parser.add_argument("--pokemon-file", default="pokemon.json")
+    rate_parser.add_argument("--pokeball-file", default="pokeball.json")
+    rate_parser.add_argument("--lookup-tables", default=None, metavar="DIR",
+                             help="read the rate from a table of every level, hp and status of the pokemon "
+                                  "and pokeball, saved in DIR (see src/lookup.py)")
+
+    serve_parser = subcommands.add_parser("serve", help="answer capture rate queries over HTTP (see src/service.py)")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--unix", default=None, metavar="PATH", help="listen on a UNIX socket instead")
+    serve_parser.add_argument("--max-batch", type=int, default=256,
+                              help="most queries evaluated together (default: 256)")
+    serve_parser.add_argument("--max-delay-ms", type=float, default=2,
+                              help="longest wait for a batch to fill up (default: 2)")
+    serve_parser.add_argument("--pokemon-file", default="pokemon.json")
+    serve_parser.add_argument("--pokeball-file", default="pokeball.json")
+
+    bulk_parser = subcommands.add_parser("bulk", help="evaluate a JSONL file of capture rate queries (see src/bulk.py)")
+    bulk_parser.add_argument("input", help="JSONL queries, - for stdin")
+    bulk_parser.add_argument("output", help="JSONL results, - for stdout")
+    bulk_parser.add_argument("--batch-size", type=int, default=100_000,
+                             help="queries read and evaluated at a time (default: 100000)")
+    bulk_parser.add_argument("--pokemon-file", default="pokemon.json")
+    bulk_parser.add_argument("--pokeball-file", default="pokeball.json")
+
+    # The remaining arguments are parsed by the tools themselves, -h included
+    subcommands.add_parser("generate", add_help=False,
+                           help="write every combination of properties of the given pokemon (2d)")
+    subcommands.add_parser("visualize", add_help=False,
+                           help="draw the heatmaps of the generated combinations (2d and 2e)")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Options or the config file of previous versions first are arguments of
+    # simulate, any other word is left to argparse to report as an invalid
+    # subcommand, so a mistyped one does not run the whole simulation
+    if not argv or (argv[0] not in ["-h", "--help"] and _is_simulate_argument(argv[0])):
+        argv = ["simulate"] + argv
+
+    parser = build_parser()
+    args, remaining = parser.parse_known_args(argv)
+    if args.command == "generate":
+        generate(remaining)
+    elif args.command == "visualize":
+        visualize(remaining)
+    elif remaining:
+        parser.error(f"unrecognized arguments: {' '.join(remaining)}")
+    elif args.command == "bulk":
+        bulk(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "rate":
+        try:
+            rate(args)
+        except ValueError as error:
+            parser.error(str(error))
+    else:
+        simulate(args)
+
+
+if __name__ == "__main__":
+    main()
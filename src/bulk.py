@@ -0,0 +1,120 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import IO, Iterator, List, NamedTuple, Optional
+
+from src.pokeball import load_pokeballs
+from src.pokemon import PokemonFactory, SpeciesRegistry, get_species_registry
+from src.queries import evaluate_queries, parse_query, species_names
+
+# Bulk mode: reads a JSONL file with one capture rate query per line, e.g.
+#   {"id": 7, "pokemon": "snorlax", "pokeball": "ultraball", "level": 50, "status": "sleep", "hp": 0.5}
+# and writes one JSONL result per line, in the same order, with the fields of
+# the query plus "capture_rate", or "error" when the query is not valid.
+# level, status and hp default to 100, "none" and 1 as in `main.py rate`.
+
+
+class BatchReport(NamedTuple):
+    batch: int
+    queries: int
+    errors: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        return self.queries / self.seconds if self.seconds > 0 else float("inf")
+
+
+@contextmanager
+def _open(path: str, mode: str) -> Iterator[IO]:
+    # "-" stands for stdin or stdout
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(path, mode) as file:
+        yield file
+
+
+def _evaluate_lines(factory: PokemonFactory, registry: SpeciesRegistry, lines: List[str]) -> List[dict]:
+    species = species_names(registry)
+    records, queries, valid = [], [], []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            records.append({"line": line.rstrip("\n"), "error": "Every line has to be a JSON object"})
+            continue
+
+        try:
+            queries.append(parse_query(species, record))
+            valid.append(len(records))
+        except ValueError as error:
+            record["error"] = str(error)
+        records.append(record)
+
+    if queries:
+        for index, capture_rate in zip(valid, evaluate_queries(factory, queries).tolist()):
+            records[index]["capture_rate"] = capture_rate
+    return records
+
+
+def process_queries(
+    input_path: str,
+    output_path: str,
+    batch_size=100_000,
+    src_file="pokemon.json",
+    pokeball_file="pokeball.json",
+    report: Optional[IO] = sys.stderr,
+) -> List[BatchReport]:
+    """Evaluates a JSONL file of capture rate queries batch_size lines at a time
+
+    Only one batch of lines and results is held in memory, so files of any
+    length can be processed. Empty lines are skipped.
+
+    Parameters
+    ----------
+    input_path::[str]
+        JSONL file with one query per line, "-" for stdin
+    output_path::[str]
+        JSONL file the results are written to, "-" for stdout
+    batch_size::[int]
+        Queries evaluated together
+    src_file::[str]
+        Species database the pokemon are read from
+    pokeball_file::[str]
+        File the custom pokeballs are registered from
+    report::[IO]
+        Where the throughput of every batch is printed, None to disable it
+
+    Returns
+    -------
+    reports::List[BatchReport]
+        Size, number of invalid queries and duration of every batch
+    """
+    load_pokeballs(pokeball_file)
+    factory = PokemonFactory(src_file)
+    registry = get_species_registry(src_file)
+
+    reports = []
+    with _open(input_path, "r") as source, _open(output_path, "w") as destination:
+        lines = (line for line in source if line.strip())
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                break
+
+            start = time.perf_counter()
+            records = _evaluate_lines(factory, registry, batch)
+            destination.writelines(json.dumps(record) + "\n" for record in records)
+            errors = sum("error" in record for record in records)
+            reports.append(BatchReport(len(reports) + 1, len(records), errors, time.perf_counter() - start))
+
+            if report is not None:
+                last = reports[-1]
+                print(f"Batch {last.batch}: {last.queries} queries ({last.errors} invalid) "
+                      f"in {last.seconds:.3f}s, {last.throughput:.0f} queries/s", file=report)
+    return reports
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple, TypeVar
+
+V = TypeVar("V")
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class LRUCache:
+    """Dictionary bounded to maxsize entries, the least recently used is dropped
+
+    Unlike functools.lru_cache the key is built by the caller, so objects that
+    are not hashable (like a Pokemon, whose hp changes) can be cached by the
+    parts of their state the value depends on. Hits, misses and evictions are
+    counted and reported by stats.
+    """
+
+    def __init__(self, maxsize=4096):
+        if maxsize < 1:
+            raise ValueError("maxsize has to be at least 1")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, compute: Callable[[], V]) -> V:
+        # Returns the cached value of key, computing and storing it if missing
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self._misses += 1
+            value = self._entries[key] = compute()
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return value
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self.maxsize)
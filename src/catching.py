@@ -1,23 +1,60 @@
-import random
-from typing import Tuple
+from typing import Optional, Sequence, Tuple
 
 import numpy as np
 
-from .pokeball import BasePokeball, FastBall, HeavyBall, PokeBall, UltraBall
-from .pokemon import Pokemon
+from .cache import CacheStats, LRUCache
+from .instrumentation import instrumented
+from .noise import get_noise_model
+from .pokeball import BallStrategy, get_pokeball
+from .pokemon import Pokemon, PokemonBatch, PokemonFactory, StatusEffect
+from .rng import CatchRNG, default_rng
 
-random.seed(42)
+# Noiseless capture rates of the latest (pokemon state, pokeball) pairs seen
+# by attempt_catch, simulations throw many times at the same pokemon
+capture_rate_cache = LRUCache(maxsize=4096)
 
-_POKEBALL = {
-    "pokeball": lambda x: PokeBall(x),
-    "ultraball": lambda x: UltraBall(x),
-    "fastball": lambda x: FastBall(x),
-    "heavyball": lambda x: HeavyBall(x),
-}
 
+def capture_rate_cache_stats() -> CacheStats:
+    return capture_rate_cache.stats()
 
+
+def capture_rate(pokemon: Pokemon, pokeball_type: str) -> float:
+    """Probability of catching a pokemon with a pokeball when there is no noise
+
+    Only depends on the pokemon and the pokeball, so it can be computed once
+    and reused for every throw of a simulation.
+    """
+    return min(_capture_rate(pokemon, get_pokeball(pokeball_type)), 1)
+
+
+def raw_capture_rate(pokemon: Pokemon, pokeball_type: str) -> float:
+    # Capture rate before it is capped at 1, the noise multiplier is applied to
+    # this value and the product is capped, as attempt_catch does
+    return _capture_rate(pokemon, get_pokeball(pokeball_type))
+
+
+def _capture_rate(pokemon: Pokemon, pokeball: BallStrategy) -> float:
+    max_hp = pokemon.max_hp
+    curr_hp = pokemon.current_hp
+    catch_rate = pokeball.catch_rate(pokemon)
+    ball_rate = pokeball.ball_rate
+
+    # Get the property value from the enum, value[0] would be the name
+    status = pokemon.status_effect.value[1]
+
+    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * status
+    denominator = max_hp * 3
+
+    return round((numerator / denominator) / 256, 4)
+
+
+@instrumented("attempt_catch", throws=lambda result, *args, **kwargs: 1)
 def attempt_catch(
-    pokemon: Pokemon, pokeball_type: str, noise=0.0
+    pokemon: Pokemon,
+    pokeball_type: str,
+    noise=0.0,
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
 ) -> Tuple[bool, float]:
     """Simulates throwing a pokeball to catch a pokemon
 
@@ -27,6 +64,12 @@ def attempt_catch(
         The pokemon being caught
     pokeball::[str]
         The type of pokeball to use
+    noise::[float]
+        Standard deviation of the capture rate noise multiplier
+    rng::[CatchRNG]
+        Source of the random draws, defaults to the shared src.rng generator
+    noise_model::[str]
+        Distribution of the noise multiplier, a key of src.noise.NOISE_MODELS
 
     Returns
     -------
@@ -36,29 +79,161 @@ def attempt_catch(
     capture_rate::float
         The probability of the pokemon being caught
     """
-    if pokeball_type not in _POKEBALL:
-        raise ValueError("Invalid pokeball type")
+    # The key holds everything the rate depends on, the strategy object itself
+    # so a pokeball registered again under the same name is not mixed up
+    pokeball = get_pokeball(pokeball_type)
+    key = (
+        pokemon.stats,
+        pokemon.catch_rate,
+        pokemon.weight,
+        pokemon.level,
+        pokemon.current_hp,
+        pokemon.status_effect,
+        pokeball,
+    )
+    rate = capture_rate_cache.get(key, lambda: _capture_rate(pokemon, pokeball))
+    rng = rng or default_rng()
+
+    # Without noise the multiplier is always 1, so no normal value is drawn
+    if noise:
+        rate = rate * get_noise_model(noise_model)(rng, noise)
+    rate = min(rate, 1)
+
+    return (rng.uniform() < rate, rate)
+
+
+def _round(values: np.ndarray, decimals: int) -> np.ndarray:
+    # np.round scales by 10**decimals before rounding, which can land on the
+    # other side of a tie than the builtin round used by attempt_catch. Values
+    # close to a tie are rounded with the builtin so both always agree
+    rounded = np.array(np.round(values, decimals))
+    scaled = values * 10**decimals
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, decimals) for value in values[near_tie].tolist()]
+    return rounded
+
+
+def raw_capture_rate_batch(pokemons: PokemonBatch, pokeball_types: Sequence[str], shape=None) -> np.ndarray:
+    # Vectorized raw_capture_rate of every pokemon of a batch, broadcast to shape
+    balls, ball_idx = np.unique(np.asarray(pokeball_types, dtype=str), return_inverse=True)
+    strategies = [get_pokeball(ball) for ball in balls]
+
+    if shape is None:
+        shape = np.broadcast_shapes(pokemons.shape, np.shape(pokeball_types))
+    ball_idx = np.broadcast_to(ball_idx.reshape(np.shape(pokeball_types)), shape)
+    species_catch_rate = np.broadcast_to(pokemons.catch_rate, shape)
+    weight = np.broadcast_to(pokemons.weight, shape)
+    speed = np.broadcast_to(pokemons.speed, shape)
+
+    catch_rate = np.empty(shape)
+    ball_rate = np.empty(shape)
+    for i, pokeball in enumerate(strategies):
+        mask = ball_idx == i
+        catch_rate[mask] = pokeball.batch_catch_rate(
+            species_catch_rate[mask], weight[mask], speed[mask]
+        )
+        ball_rate[mask] = pokeball.ball_rate
+
+    max_hp = pokemons.max_hp
+    curr_hp = pokemons.current_hp
+
+    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * pokemons.status
+    denominator = max_hp * 3
 
-    # Instanciating pokeball with pokemon to catch
-    pokeball: BasePokeball = _POKEBALL[pokeball_type.lower()](pokemon)
+    return np.broadcast_to(_round(numerator / denominator / 256, 4), shape)
 
-    max_hp = pokemon.max_hp
-    curr_hp = pokemon.current_hp
-    catch_rate = pokeball.catch_rate
-    ball_rate = pokeball.ball_rate
 
-    # Get the property value from the enum, value[0] would be the name
-    status = pokemon.status_effect.value[1]
+@instrumented("attempt_catch_pokemon_batch", throws=lambda result, *args, **kwargs: result[0].size)
+def attempt_catch_pokemon_batch(
+    pokemons: PokemonBatch,
+    pokeball_types: Sequence[str],
+    noise=0.0,
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simulates throwing pokeballs at every pokemon of a batch at once
 
-    numerator = 1 + (max_hp * 3 - curr_hp * 2) * catch_rate * ball_rate * status
-    denominator = max_hp * 3
+    Parameters
+    ----------
+    pokemons::[PokemonBatch]
+        The pokemon being caught
+    pokeball_types::[Sequence[str]]
+        The type of pokeball used on each throw, broadcast against the batch
+    noise::[float | Sequence[float]]
+        Standard deviation of the capture rate noise multiplier
+    rng::[CatchRNG]
+        Source of the random draws, defaults to the shared src.rng generator
+    noise_model::[str]
+        Distribution of the noise multiplier, a key of src.noise.NOISE_MODELS
 
-    noise_multiplier = np.random.normal(1, noise)
-    if noise_multiplier < 0:
-        noise_multiplier = 0
+    Returns
+    -------
+    attempt_success::np.ndarray[bool]
+        True on each throw that caught the pokemon
+
+    capture_rate::np.ndarray[float]
+        The probability of each pokemon being caught
+    """
+    shape = np.broadcast_shapes(pokemons.shape, np.shape(pokeball_types), np.shape(noise))
+    capture_rate = raw_capture_rate_batch(pokemons, pokeball_types, shape)
+
+    rng = rng or default_rng()
+    if np.any(noise):
+        noise_multiplier = get_noise_model(noise_model)(rng, noise, shape)
+        capture_rate = capture_rate * noise_multiplier
+    capture_rate = np.minimum(capture_rate, 1)
+
+    return (rng.random(shape) < capture_rate, capture_rate)
+
+
+def attempt_catch_batch(
+    pokemon_names: Sequence[str],
+    pokeball_types: Sequence[str],
+    levels: Sequence[int],
+    hp_percentages: Sequence[float],
+    statuses: Sequence[StatusEffect],
+    noise=0.0,
+    src_file="pokemon.json",
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simulates many pokeball throws at once
+
+    Every argument is broadcast against the others, so scalars can be used for
+    the properties shared by all throws. Each throw uses the same formula as
+    attempt_catch on a pokemon built by PokemonFactory.create.
+
+    Parameters
+    ----------
+    pokemon_names::[Sequence[str]]
+        Species of the pokemon being caught
+    pokeball_types::[Sequence[str]]
+        The type of pokeball used on each throw
+    levels::[Sequence[int]]
+        Level of each pokemon
+    hp_percentages::[Sequence[float]]
+        Remaining hp of each pokemon, as a value between 0 and 1
+    statuses::[Sequence[StatusEffect]]
+        Status effect of each pokemon
+    noise::[float | Sequence[float]]
+        Standard deviation of the capture rate noise multiplier
+    src_file::[str]
+        Species database the pokemon are read from
+    rng::[CatchRNG]
+        Source of the random draws, defaults to the shared src.rng generator
+    noise_model::[str]
+        Distribution of the noise multiplier, a key of src.noise.NOISE_MODELS
 
-    capture_rate = round((numerator / denominator) / 256, 4) * noise_multiplier
-    if capture_rate > 1:
-        capture_rate = 1
+    Returns
+    -------
+    attempt_success::np.ndarray[bool]
+        True on each throw that caught the pokemon
 
-    return (random.uniform(0, 1) < capture_rate, capture_rate)
+    capture_rate::np.ndarray[float]
+        The probability of each pokemon being caught
+    """
+    pokemons = PokemonFactory(src_file).create_batch(
+        pokemon_names, levels, statuses, hp_percentages
+    )
+    return attempt_catch_pokemon_batch(pokemons, pokeball_types, noise, rng, noise_model)
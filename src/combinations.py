@@ -0,0 +1,247 @@
+import zipfile
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+# Binary counterpart of the *_conditions_combination.txt files written by
+# utils/all_combination_of_properties_generator.py. Every column is stored as
+# a typed NumPy array inside an .npz file, the string columns as small integer
+# codes plus the array of their labels.
+
+NPZ_SUFFIX = "_conditions_combination.npz"
+TXT_SUFFIX = "_conditions_combination.txt"
+
+
+def _encode(values, lower=False):
+    # Categoricals are already encoded, which avoids hashing millions of strings
+    if isinstance(values, pd.Categorical):
+        labels, codes = np.asarray(values.categories, dtype=str), values.codes
+    else:
+        labels, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    if lower:
+        labels, lowered = np.unique(np.char.lower(labels), return_inverse=True)
+        codes = lowered[codes]
+    return labels, codes.astype(np.uint8 if len(labels) <= 256 else np.uint32)
+
+
+def write_combinations(file_path, pokemon, pokeball, level, status, hp, capture_rate):
+    """Writes one combination per row as columns of an .npz file
+
+    Parameters
+    ----------
+    file_path::[str]
+        Destination file, numpy adds the .npz extension if missing
+    pokemon, pokeball, status::[Sequence[str] | pd.Categorical]
+        Name columns, status is stored lower case as in the parsed text files.
+        A single pokemon name is used for every row
+    level::[Sequence[int]]
+        Level of the pokemon
+    hp::[Sequence[float]]
+        Remaining hp as a percentage, as in the HP lines of the text files
+    capture_rate::[Sequence[float]]
+        Capture rate returned by attempt_catch
+    """
+    if isinstance(pokemon, str):
+        pokemon = pd.Categorical.from_codes(np.zeros(len(capture_rate), dtype=np.int8), [pokemon])
+    pokemon_labels, pokemon_codes = _encode(pokemon)
+    pokeball_labels, pokeball_codes = _encode(pokeball)
+    status_labels, status_codes = _encode(status, lower=True)
+
+    np.savez(
+        file_path,
+        pokemon_labels=pokemon_labels,
+        pokemon=pokemon_codes,
+        pokeball_labels=pokeball_labels,
+        pokeball=pokeball_codes,
+        level=np.asarray(level, dtype=np.int16),
+        status_labels=status_labels,
+        status=status_codes,
+        hp=np.asarray(hp, dtype=np.float64),
+        capture_rate=np.asarray(capture_rate, dtype=np.float64),
+    )
+
+
+def load_combinations(file_path) -> pd.DataFrame:
+    """Reads an .npz file written by write_combinations
+
+    Returns the same DataFrame that parse_pokemon_file builds from a text
+    file: Pokemon, Pokeball, Level, Status, HP (as a proportion), CaptureRate.
+    """
+    with np.load(file_path) as data:
+        return pd.DataFrame(
+            {
+                "Pokemon": data["pokemon_labels"][data["pokemon"]],
+                "Pokeball": data["pokeball_labels"][data["pokeball"]],
+                "Level": data["level"].astype(np.int64),
+                "Status": data["status_labels"][data["status"]],
+                "HP": data["hp"] / 100,  # Convert to proportion
+                "CaptureRate": data["capture_rate"],
+            }
+        )
+
+
+def _iter_npy_member(archive, name, chunksize):
+    # Reads an uncompressed .npy member of an .npz file chunksize items at a
+    # time instead of loading the whole column
+    with archive.open(f"{name}.npy") as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+        remaining = int(np.prod(shape))
+        while remaining > 0:
+            count = min(chunksize, remaining)
+            yield np.frombuffer(member.read(count * dtype.itemsize), dtype=dtype, count=count)
+            remaining -= count
+
+
+def _iter_npz_combinations(file_path, chunksize):
+    with np.load(file_path) as data:
+        labels = {column: data[f"{column}_labels"] for column in ("pokemon", "pokeball", "status")}
+
+    with zipfile.ZipFile(file_path) as archive:
+        columns = ("pokemon", "pokeball", "level", "status", "hp", "capture_rate")
+        readers = [_iter_npy_member(archive, column, chunksize) for column in columns]
+        for pokemon, pokeball, level, status, hp, capture_rate in zip(*readers):
+            yield pd.DataFrame(
+                {
+                    "Pokemon": labels["pokemon"][pokemon],
+                    "Pokeball": labels["pokeball"][pokeball],
+                    "Level": level.astype(np.int64),
+                    "Status": labels["status"][status],
+                    "HP": hp / 100,  # Convert to proportion
+                    "CaptureRate": capture_rate,
+                }
+            )
+
+
+def _iter_txt_combinations(file_path, chunksize):
+    data = []
+    with open(file_path, "r") as file:
+        entry = {}
+        for line in file:
+            line = line.strip()
+
+            if line.startswith("Pokemon:"):
+                entry["Pokemon"] = line.split("Pokemon:")[1].strip()
+            elif line.startswith("Pokeball:"):
+                entry["Pokeball"] = line.split("Pokeball:")[1].strip()
+            elif line.startswith("Level:"):
+                entry["Level"] = int(line.split("Level:")[1].strip())
+            elif line.startswith("Status:"):
+                entry["Status"] = line.split("Status:")[1].strip().lower()
+            elif line.startswith("HP:"):
+                entry["HP"] = float(line.split("HP:")[1].strip()) / 100  # Convert to proportion
+            elif line.startswith("CaptureRate:"):
+                entry["CaptureRate"] = float(line.split("CaptureRate:")[1].strip())
+            elif line.startswith("---------"):
+                if entry:  # Only append if entry is not empty
+                    data.append(entry)
+                    entry = {}
+                    if len(data) == chunksize:
+                        yield pd.DataFrame(data)
+                        data = []
+
+    # Adds the last entry if file doesn't end with dashes
+    if entry:
+        data.append(entry)
+    if data:
+        yield pd.DataFrame(data)
+
+
+def iter_combinations(file_path, chunksize=100_000) -> Iterator[pd.DataFrame]:
+    """Reads a combinations file as DataFrames of at most chunksize rows
+
+    Works with both the .txt and the .npz files, only one chunk is held in
+    memory at a time. The chunks have the columns of load_combinations.
+    """
+    if file_path.endswith(".npz"):
+        return _iter_npz_combinations(file_path, chunksize)
+    return _iter_txt_combinations(file_path, chunksize)
+
+
+class LevelRangeMoments:
+    """Incremental count, sum, sum of squares, min and max of the capture rate
+
+    Rows are accumulated per (Pokeball, Status, HP) for each of the level
+    ranges, which may overlap, with a single groupby per chunk: the levels are
+    split into the disjoint intervals between the bounds of the ranges and
+    every range is assembled from its intervals in results. Memory only depends
+    on the size of that grid and not on the number of rows fed with update.
+    """
+
+    KEYS = ["Pokeball", "Status", "HP"]
+    COLUMNS = ["count", "sum", "sumsq", "min", "max"]
+    _COMBINE = {"count": "sum", "sum": "sum", "sumsq": "sum", "min": "min", "max": "max"}
+
+    def __init__(self, level_ranges):
+        self.level_ranges = list(level_ranges)
+        # Interval i covers the levels in [edges[i], edges[i + 1])
+        self._edges = np.unique([bound for first, last in self.level_ranges for bound in (first, last + 1)])
+        self._intervals = {
+            (first, last): np.flatnonzero((self._edges[:-1] >= first) & (self._edges[:-1] <= last))
+            for first, last in self.level_ranges
+        }
+        self._moments = None
+
+    def update(self, chunk: pd.DataFrame):
+        interval = np.searchsorted(self._edges, chunk["Level"].to_numpy(), side="right") - 1
+        inside = (interval >= 0) & (interval < len(self._edges) - 1)
+        chunk = chunk[inside]
+        moments = (
+            chunk.assign(Interval=interval[inside], CaptureRateSquared=chunk["CaptureRate"] ** 2)
+            .groupby(["Interval"] + self.KEYS)
+            .agg(
+                count=("CaptureRate", "count"),
+                sum=("CaptureRate", "sum"),
+                sumsq=("CaptureRateSquared", "sum"),
+                min=("CaptureRate", "min"),
+                max=("CaptureRate", "max"),
+            )
+        )
+        if self._moments is None:
+            self._moments = moments
+        else:
+            self._moments = pd.concat([self._moments, moments]).groupby(level=list(moments.index.names)).agg(self._COMBINE)
+        return self
+
+    def results(self):
+        """Moments of every level range
+
+        Returns a dict mapping each (first_level, last_level) to a DataFrame
+        with the KEYS and count, sum, sumsq, min and max columns.
+        """
+        results = {}
+        for level_range, intervals in self._intervals.items():
+            if self._moments is None:
+                results[level_range] = pd.DataFrame(columns=self.KEYS + self.COLUMNS)
+                continue
+            moments = self._moments[self._moments.index.get_level_values("Interval").isin(intervals)]
+            results[level_range] = moments.groupby(level=self.KEYS).agg(self._COMBINE).reset_index()
+        return results
+
+
+class CaptureRateMoments(LevelRangeMoments):
+    """LevelRangeMoments of the levels between first_level and last_level"""
+
+    def __init__(self, first_level=1, last_level=100):
+        super().__init__([(first_level, last_level)])
+        self.first_level = first_level
+        self.last_level = last_level
+
+    def result(self) -> pd.DataFrame:
+        return self.results()[(self.first_level, self.last_level)]
+
+
+def aggregate_combinations(file_path, level_ranges, chunksize=100_000):
+    """Accumulates the moments of every level range in a single pass over a file
+
+    Returns a dict mapping each (first_level, last_level) to the DataFrame
+    returned by LevelRangeMoments.results.
+    """
+    accumulator = LevelRangeMoments(level_ranges)
+    for chunk in iter_combinations(file_path, chunksize):
+        accumulator.update(chunk)
+    return accumulator.results()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.combinations import load_combinations, write_combinations
+from src.pokeball import BallStrategy
+from src.pokemon import Species, StatusEffect
+
+# Checkpointed output of utils/all_combination_of_properties_generator.py.
+# The grid of every species is split in chunks of one (pokeball, status,
+# level range), each stored as a combinations .npz file named after the hash
+# of everything its capture rates depend on:
+#
+#   DIR/chunks/<key>.npz          one chunk, see write_combinations
+#   DIR/species/<pokemon>.json    the chunks of a species, in order
+#   DIR/manifest.json             every species of the dataset
+#
+# A chunk whose file exists is never computed again, so an interrupted run
+# resumes where it stopped and a change to pokemon.json only recomputes the
+# chunks of the species it touches. Chunks are only deleted when the species
+# they belonged to is written again without them; those of an interrupted run,
+# not listed by any species file yet, are kept for the next run.
+
+FORMAT_VERSION = 1  # Bump when the capture rate formula or the chunk layout changes
+
+
+class Chunk(NamedTuple):
+    pokemon: str
+    pokeball: str
+    status: str
+    first_level: int
+    last_level: int
+    rows: int
+    key: str
+
+
+def chunk_key(species: Species, strategy: BallStrategy, status: StatusEffect, levels, hps) -> str:
+    # The ball enters through its ball rate and the catch rate it sees for the
+    # species, so the key does not depend on how the ball is implemented
+    catch_rate = float(strategy.modifier(species.catch_rate, species.weight, species.stats.speed))
+    inputs = [FORMAT_VERSION, species.name, list(species.stats), species.catch_rate, species.weight,
+              strategy.name, strategy.ball_rate, catch_rate, status.name, list(status.value)]
+    digest = hashlib.sha256(json.dumps(inputs).encode())
+    digest.update(np.asarray(levels, dtype=np.int64).tobytes())
+    digest.update(np.asarray(hps, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def _replace_json(path, content) -> None:
+    # Written next to its destination and renamed, a crash never leaves half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(content, file, indent=1)
+    os.replace(temporary, path)
+
+
+class CombinationDataset:
+    """Content-addressed store of combination chunks, see the top of the module"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "chunks"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "species"), exist_ok=True)
+
+    def chunk_path(self, chunk: Chunk) -> str:
+        return os.path.join(self.directory, "chunks", f"{chunk.key}.npz")
+
+    def _species_path(self, pokemon: str) -> str:
+        return os.path.join(self.directory, "species", f"{pokemon.lower()}.json")
+
+    def has_chunk(self, chunk: Chunk) -> bool:
+        return os.path.exists(self.chunk_path(chunk))
+
+    def write_chunk(self, chunk: Chunk, level, hp, capture_rate) -> None:
+        path = self.chunk_path(chunk)
+        temporary = f"{path[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+        write_combinations(temporary, chunk.pokemon, np.full(len(capture_rate), chunk.pokeball), level,
+                           np.full(len(capture_rate), chunk.status), hp, capture_rate)
+        os.replace(temporary, path)
+
+    def read_chunk(self, chunk: Chunk) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # level, hp (as a percentage) and capture_rate columns of a chunk
+        with np.load(self.chunk_path(chunk)) as data:
+            return data["level"].astype(np.int64), data["hp"], data["capture_rate"]
+
+    def write_species(self, pokemon: str, chunks: List[Chunk]) -> int:
+        # Replaces the chunk list of a species and deletes the chunks its previous
+        # list had and the new one does not, returns how many were deleted. Keys
+        # include the species, so no other species can refer to them
+        previous = self.species_chunks(pokemon) if os.path.exists(self._species_path(pokemon)) else []
+        _replace_json(self._species_path(pokemon), [chunk._asdict() for chunk in chunks])
+        keys = {chunk.key for chunk in chunks}
+        removed = 0
+        for chunk in previous:
+            if chunk.key not in keys and self.has_chunk(chunk):
+                os.remove(self.chunk_path(chunk))
+                removed += 1
+        return removed
+
+    def species_chunks(self, pokemon: str) -> List[Chunk]:
+        with open(self._species_path(pokemon), "r") as file:
+            return [Chunk(**chunk) for chunk in json.load(file)]
+
+    def species(self) -> List[str]:
+        directory = os.path.join(self.directory, "species")
+        return sorted(name[:-len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+
+    def iter_species(self, pokemon: str) -> Iterator[pd.DataFrame]:
+        # Chunks of a species with the columns of load_combinations
+        for chunk in self.species_chunks(pokemon):
+            yield load_combinations(self.chunk_path(chunk))
+
+    def write_manifest(self) -> Dict[str, dict]:
+        """Writes manifest.json with the number of chunks and rows of every species
+
+        Returns
+        -------
+        species::Dict[str, dict]
+            The "species" entry of the manifest
+        """
+        species = {}
+        for pokemon in self.species():
+            chunks = self.species_chunks(pokemon)
+            species[pokemon] = {
+                "file": os.path.join("species", f"{pokemon}.json"),
+                "chunks": len(chunks),
+                "rows": sum(chunk.rows for chunk in chunks),
+                "complete": all(self.has_chunk(chunk) for chunk in chunks),
+            }
+        _replace_json(os.path.join(self.directory, "manifest.json"),
+                      {"version": FORMAT_VERSION, "species": species})
+        return species
@@ -0,0 +1,243 @@
+import math
+from statistics import NormalDist
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .catching import capture_rate as noiseless_capture_rate, raw_capture_rate
+from .instrumentation import instrumented
+from .noise import get_noise_model
+from .pokemon import Pokemon
+from .rng import CatchRNG, default_rng
+
+
+class CaptureEstimate(NamedTuple):
+    probability: float  # Probability of a single throw catching the pokemon
+    mean: float  # Expected proportion of captures per experiment
+    std_dev: float  # Standard deviation of that proportion across experiments
+
+
+def estimate_capture(
+    pokemon: Pokemon,
+    pokeball_type: str,
+    attempts: int,
+    experiments=1,
+    noise=0.0,
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
+) -> CaptureEstimate:
+    """Estimates the outcome of `experiments` runs of `attempts` throws each
+
+    Without noise every throw is a Bernoulli trial with the capture rate
+    returned by attempt_catch, so the captures of an experiment follow a
+    binomial distribution and no sampling is needed. With noise the capture
+    rate changes on every throw and the experiments are simulated instead.
+
+    Parameters
+    ----------
+    pokemon::[Pokemon]
+        The pokemon being caught
+    pokeball_type::[str]
+        The type of pokeball to use
+    attempts::[int]
+        Number of throws per experiment
+    experiments::[int]
+        Number of independent experiments, only used when sampling
+    noise::[float]
+        Standard deviation of the capture rate noise multiplier
+    rng::[CatchRNG]
+        Source of the random draws, defaults to the shared src.rng generator
+    noise_model::[str]
+        Distribution of the noise multiplier, a key of src.noise.NOISE_MODELS
+
+    Returns
+    -------
+    estimate::CaptureEstimate
+        Capture probability and mean/std of the proportion of captures
+    """
+    if noise == 0:
+        capture_rate = noiseless_capture_rate(pokemon, pokeball_type)
+        std_dev = math.sqrt(capture_rate * (1 - capture_rate) / attempts)
+        return CaptureEstimate(capture_rate, capture_rate, std_dev)
+
+    return sample_capture(pokemon, pokeball_type, attempts, experiments, noise, rng, noise_model)
+
+
+def _sampled_throws(result, pokemon, pokeball_type, attempts, experiments=1, *args, **kwargs) -> int:
+    return attempts * experiments
+
+
+@instrumented("sample_capture", throws=_sampled_throws)
+def sample_capture(
+    pokemon: Pokemon,
+    pokeball_type: str,
+    attempts: int,
+    experiments=1,
+    noise=0.0,
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
+) -> CaptureEstimate:
+    """Simulates `experiments` runs of `attempts` throws each
+
+    Takes the same parameters as estimate_capture, the probability and the
+    mean are both the average proportion of captures across experiments.
+    """
+    rng = rng or default_rng()
+
+    # Only the noise and the final draw change between throws, so the noiseless
+    # capture rate is computed once and all the throws are drawn in bulk, the
+    # same way attempt_catch applies the noise
+    capture_rates = noiseless_capture_rate(pokemon, pokeball_type)
+    if noise:
+        noise_multiplier = get_noise_model(noise_model)(rng, noise, (experiments, attempts))
+        capture_rates = np.minimum(raw_capture_rate(pokemon, pokeball_type) * noise_multiplier, 1)
+
+    catched = (rng.random((experiments, attempts)) < capture_rates).sum(axis=1)
+    capture_attempts = catched / attempts
+
+    mean = float(np.mean(capture_attempts))
+    return CaptureEstimate(mean, mean, float(np.std(capture_attempts)))
+
+
+class SequentialEstimate(NamedTuple):
+    probability: float  # Proportion of captures among the throws used
+    lower: float  # Confidence interval of the capture probability
+    upper: float
+    trials: int  # Throws used before the interval was narrow enough
+    captures: int
+
+
+def wilson_interval(captures: int, trials: int, confidence=0.95) -> Tuple[float, float]:
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    proportion = captures / trials
+    denominator = 1 + z**2 / trials
+    center = (proportion + z**2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(proportion * (1 - proportion) / trials + z**2 / (4 * trials**2)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def _binomial_log_probability(log_factorials: np.ndarray, first: int, last: int, trials: int, p: float) -> float:
+    # log P(first <= X <= last) for X ~ Binomial(trials, p), summed in log space
+    k = np.arange(first, last + 1)
+    log_pmf = (
+        log_factorials[trials] - log_factorials[k] - log_factorials[trials - k]
+        + k * math.log(p) + (trials - k) * math.log1p(-p)
+    )
+    top = log_pmf.max()
+    return float(top + np.log(np.exp(log_pmf - top).sum()))
+
+
+def _bisect(function, target: float, increasing: bool) -> float:
+    # Solves function(p) = target for p in (0, 1), function being monotonic
+    low, high = 0.0, 1.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if (function(middle) < target) == increasing:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def clopper_pearson_interval(captures: int, trials: int, confidence=0.95) -> Tuple[float, float]:
+    # Exact interval, the bounds are found by bisection on the binomial cdf
+    # instead of the beta quantiles so no scipy is needed
+    alpha = math.log((1 - confidence) / 2)
+    log_factorials = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, trials + 1)))))
+
+    lower, upper = 0.0, 1.0
+    if captures > 0:
+        # P(X >= captures) = alpha / 2, the upper tail grows with p
+        lower = _bisect(
+            lambda p: _binomial_log_probability(log_factorials, captures, trials, trials, p),
+            alpha,
+            increasing=True,
+        )
+    if captures < trials:
+        # P(X <= captures) = alpha / 2, the cdf decreases with p
+        upper = _bisect(
+            lambda p: _binomial_log_probability(log_factorials, 0, captures, trials, p),
+            alpha,
+            increasing=False,
+        )
+    return lower, upper
+
+
+INTERVALS = {
+    "wilson": wilson_interval,
+    "clopper_pearson": clopper_pearson_interval,
+}
+
+
+@instrumented("estimate_capture_sequential", throws=lambda result, *args, **kwargs: result.trials)
+def estimate_capture_sequential(
+    pokemon: Pokemon,
+    pokeball_type: str,
+    width=0.02,
+    confidence=0.95,
+    method="wilson",
+    batch_size=100,
+    max_trials=100_000,
+    noise=0.0,
+    rng: Optional[CatchRNG] = None,
+    noise_model="normal",
+) -> SequentialEstimate:
+    """Throws pokeballs until the capture probability is known well enough
+
+    Throws are drawn in batches of batch_size and the simulation stops as soon
+    as the confidence interval of the capture probability is at most width
+    wide, or after max_trials throws. Species that are almost always (or
+    never) caught need far fewer throws than a fixed number of attempts.
+
+    Parameters
+    ----------
+    pokemon::[Pokemon]
+        The pokemon being caught
+    pokeball_type::[str]
+        The type of pokeball to use
+    width::[float]
+        Target width of the confidence interval
+    confidence::[float]
+        Confidence level of the interval
+    method::[str]
+        "wilson" or "clopper_pearson" (exact, wider)
+    batch_size::[int]
+        Throws drawn between two checks of the interval
+    max_trials::[int]
+        Throws after which the estimate is returned regardless of its width
+    noise, rng, noise_model
+        As in sample_capture
+
+    Returns
+    -------
+    estimate::SequentialEstimate
+        Proportion of captures, its interval and the number of throws used
+    """
+    if method not in INTERVALS:
+        raise ValueError("Invalid interval method")
+    interval = INTERVALS[method]
+    rng = rng or default_rng()
+
+    rate = noiseless_capture_rate(pokemon, pokeball_type)
+    raw_rate = raw_capture_rate(pokemon, pokeball_type)
+    trials = captures = 0
+    while trials < max_trials:
+        size = min(batch_size, max_trials - trials)
+        capture_rates = rate
+        if noise:
+            capture_rates = np.minimum(raw_rate * get_noise_model(noise_model)(rng, noise, size), 1)
+        captures += int((rng.random(size) < capture_rates).sum())
+        trials += size
+
+        # The Clopper-Pearson interval is always wider than Wilson's, so the
+        # exact one is only computed once the cheap one is narrow enough
+        lower, upper = wilson_interval(captures, trials, confidence)
+        if upper - lower > width:
+            continue
+        if method != "wilson":
+            lower, upper = interval(captures, trials, confidence)
+        if upper - lower <= width:
+            return SequentialEstimate(captures / trials, lower, upper, trials, captures)
+
+    lower, upper = interval(captures, trials, confidence)
+    return SequentialEstimate(captures / trials, lower, upper, trials, captures)
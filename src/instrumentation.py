@@ -0,0 +1,190 @@
+import atexit
+import functools
+import json
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Switchable instrumentation of the hot paths. Functions decorated with
+# @instrumented count their calls, wall time and pokeball throws while it is
+# enabled. The decorator only wraps them if it is enabled when they are
+# defined, otherwise it returns them untouched and they cost nothing more, so
+# enable() has to be called before the instrumented modules are imported. The
+# metrics are exported with to_json or to_prometheus.
+#
+# Setting the CATCH_INSTRUMENTATION environment variable enables it for the
+# whole process and exports the metrics when it exits, to the file the
+# variable names if it ends in .json or .prom and to metrics.json otherwise.
+
+PERCENTILES = (50, 90, 99)
+SAMPLES = 10_000  # Durations kept per function for the percentiles
+ENV_VARIABLE = "CATCH_INSTRUMENTATION"
+DEFAULT_EXPORT = "metrics.json"
+
+
+class _State:
+    enabled = os.environ.get(ENV_VARIABLE, "") not in ("", "0")
+
+
+class Metric:
+    __slots__ = ("calls", "seconds", "throws", "durations")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.throws = 0
+        self.durations = deque(maxlen=SAMPLES)
+
+    def record(self, seconds: float, throws: int = 0) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.throws += throws
+        self.durations.append(seconds)
+
+    def summary(self) -> dict:
+        summary = {"calls": self.calls, "seconds": self.seconds}
+        if self.throws:
+            summary["throws"] = self.throws
+            summary["throws_per_second"] = self.throws / self.seconds if self.seconds > 0 else 0.0
+        if self.durations:
+            values = np.percentile(np.array(self.durations), PERCENTILES)
+            summary.update({f"p{p}_seconds": float(value) for p, value in zip(PERCENTILES, values)})
+        return summary
+
+
+_metrics: Dict[str, Metric] = {}
+
+
+def enable() -> None:
+    # Only functions decorated from now on are instrumented, see the top of the module
+    _State.enabled = True
+
+
+def disable() -> None:
+    _State.enabled = False
+
+
+def is_enabled() -> bool:
+    return _State.enabled
+
+
+def reset() -> None:
+    _metrics.clear()
+
+
+def instrumented(name: Optional[str] = None, throws: Optional[Callable[..., int]] = None) -> Callable:
+    """Records the calls of the decorated function while instrumentation is enabled
+
+    Returns the function itself when instrumentation is disabled, so it has
+    to be enabled before the function is defined to be recorded.
+
+    Parameters
+    ----------
+    name::[str]
+        Name of the metric, the qualified name of the function by default
+    throws::[Callable]
+        For functions that throw pokeballs, called with the result and the
+        arguments of every call and returning how many throws it made
+    """
+    def decorator(function):
+        if not _State.enabled:
+            return function
+        metric_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _State.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                seconds = time.perf_counter() - start
+                metric = _metrics.get(metric_name)
+                if metric is None:
+                    metric = _metrics[metric_name] = Metric()
+                metric.record(seconds, throws(result, *args, **kwargs) if throws and result is not None else 0)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> Dict[str, tuple]:
+    # Raw metrics, to be sent from a worker process to the parent with merge
+    return {name: (m.calls, m.seconds, m.throws, list(m.durations)) for name, m in _metrics.items()}
+
+
+def merge(other: Dict[str, tuple]) -> None:
+    for name, (calls, seconds, throws, durations) in other.items():
+        metric = _metrics.setdefault(name, Metric())
+        metric.calls += calls
+        metric.seconds += seconds
+        metric.throws += throws
+        metric.durations.extend(durations)
+
+
+def to_json() -> Dict[str, dict]:
+    """Summary of every instrumented function that was called
+
+    For each function: calls, cumulative seconds and the p50/p90/p99 of the
+    time per call. Functions that throw pokeballs also get the number of
+    throws and throws_per_second, the throws over the seconds spent in them.
+    """
+    return {name: metric.summary() for name, metric in sorted(_metrics.items())}
+
+
+def to_prometheus(prefix="catch") -> str:
+    # Prometheus text exposition format, one summary per function
+    lines: List[str] = [
+        f"# HELP {prefix}_call_seconds Wall time of the calls of each instrumented function",
+        f"# TYPE {prefix}_call_seconds summary",
+    ]
+    summaries = to_json()
+    for name, summary in summaries.items():
+        for p in PERCENTILES:
+            if f"p{p}_seconds" in summary:
+                lines.append(f'{prefix}_call_seconds{{function="{name}",quantile="{p / 100}"}} {summary[f"p{p}_seconds"]}')
+        lines.append(f'{prefix}_call_seconds_sum{{function="{name}"}} {summary["seconds"]}')
+        lines.append(f'{prefix}_call_seconds_count{{function="{name}"}} {summary["calls"]}')
+
+    throwing = {name: summary for name, summary in summaries.items() if "throws" in summary}
+    lines += [
+        f"# HELP {prefix}_throws_total Pokeballs thrown by each instrumented function",
+        f"# TYPE {prefix}_throws_total counter",
+    ]
+    lines += [f'{prefix}_throws_total{{function="{name}"}} {summary["throws"]}' for name, summary in throwing.items()]
+    lines += [
+        f"# HELP {prefix}_throws_per_second Throws per second of wall time spent in each function",
+        f"# TYPE {prefix}_throws_per_second gauge",
+    ]
+    lines += [f'{prefix}_throws_per_second{{function="{name}"}} {summary["throws_per_second"]}'
+              for name, summary in throwing.items()]
+    return "\n".join(lines) + "\n"
+
+
+def export(file_path: str) -> None:
+    # The format is taken from the extension, .prom for Prometheus, JSON otherwise
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as file:
+        if file_path.endswith(".prom"):
+            file.write(to_prometheus())
+        else:
+            json.dump(to_json(), file, indent=2)
+
+
+@atexit.register
+def _export_on_exit() -> None:
+    # Only the main process exports, the workers send their metrics to it
+    if not _State.enabled or ENV_VARIABLE not in os.environ:
+        return
+    import multiprocessing  # Only needed here, it slows down the start of every command
+    if multiprocessing.parent_process() is not None:
+        return
+    file_path = os.environ[ENV_VARIABLE]
+    export(file_path if file_path.endswith((".json", ".prom")) else DEFAULT_EXPORT)
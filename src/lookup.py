@@ -0,0 +1,177 @@
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .catching import raw_capture_rate_batch
+from .pokeball import get_pokeball
+from .pokemon import PokemonFactory, StatusEffect, get_species_registry
+
+LEVELS = np.arange(1, 101)
+HP_PERCENTAGES = np.arange(0, 101)
+STATUSES = list(StatusEffect)
+
+_STATUS_INDEX = {status: i for i, status in enumerate(STATUSES)}
+
+TABLE_VERSION = 1  # Bump when the capture rate formula or the table layout changes
+
+
+def table_key(pokemon_name: str, pokeball_type: str, src_file="pokemon.json") -> str:
+    # Hash of everything a table depends on, like dataset.chunk_key: the
+    # species record, the ball through its ball rate and the catch rate it sees
+    # for the species, the database file and the grid of the table
+    species = get_species_registry(src_file).get(pokemon_name)
+    strategy = get_pokeball(pokeball_type)
+    catch_rate = float(strategy.modifier(species.catch_rate, species.weight, species.stats.speed))
+    inputs = [TABLE_VERSION, os.path.abspath(src_file), species.name, list(species.type), list(species.stats),
+              species.catch_rate, species.weight, strategy.name, strategy.ball_rate, catch_rate,
+              [status.name for status in STATUSES], len(LEVELS), len(HP_PERCENTAGES)]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()[:32]
+
+
+class CaptureRateTable:
+    """Capture rate of one species and pokeball for every level, hp and status
+
+    The table holds the deterministic part of attempt_catch (no noise) indexed
+    by [level - 1, hp percentage, status]. It is computed on first use and
+    saved as a .npy file named after table_key, so a change to the species
+    record, the pokeball or the database file leads to a new table instead of
+    a stale one, and the table it replaces is deleted. The key is only hashed
+    again when the database is read again or the pokeball is registered again.
+    """
+
+    def __init__(
+        self,
+        pokemon_name: str,
+        pokeball_type: str,
+        directory="lookup_tables",
+        src_file="pokemon.json",
+    ):
+        self._pokemon_name = pokemon_name.lower()
+        self._pokeball_type = pokeball_type
+        self._directory = directory
+        self._src_file = src_file
+        self._registry = get_species_registry(src_file)
+        self._inputs = None  # (registry generation, pokeball strategy) the key was hashed from
+        self._key = None
+        self._table_key = None
+        self._table = None
+
+    @property
+    def path(self):
+        return self._path(self._current_key())
+
+    @property
+    def table(self) -> np.ndarray:
+        key = self._current_key()
+        if key != self._table_key:
+            path = self._path(key)
+            self._table = np.load(path) if os.path.exists(path) else self._build(path)
+            self._table_key = key
+        return self._table
+
+    def query(self, level: int, hp_percentage: int, status: StatusEffect) -> float:
+        if level < 1 or level > 100:
+            raise ValueError("level has to be value between 1 and 100")
+        if hp_percentage < 0 or hp_percentage > 100:
+            raise ValueError("hp has to be value between 0 and 100")
+        return float(self.table[level - 1, hp_percentage, _STATUS_INDEX[status]])
+
+    def _current_key(self):
+        inputs = (self._registry.generation, get_pokeball(self._pokeball_type))
+        if inputs != self._inputs:
+            self._key = table_key(self._pokemon_name, self._pokeball_type, self._src_file)
+            self._inputs = inputs
+        return self._key
+
+    def _path(self, key):
+        return os.path.join(
+            self._directory, f"{self._pokemon_name}_{self._pokeball_type}_{key}.npy"
+        )
+
+    def _build(self, path):
+        # Only the capture rates are computed, no throw is drawn from the shared
+        # generator, so a lookup does not change the draws of a seeded simulation
+        pokemons = PokemonFactory(self._src_file).create_batch(
+            self._pokemon_name,
+            LEVELS[:, None, None],
+            np.array(STATUSES, dtype=object)[None, None, :],
+            HP_PERCENTAGES[None, :, None] / 100,
+        )
+        table = np.minimum(raw_capture_rate_batch(pokemons, self._pokeball_type), 1)
+
+        # Written to a temporary file first so readers never see a partial table
+        os.makedirs(self._directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+
+        # The tables of this species and pokeball with another key are stale
+        pattern = os.path.join(glob.escape(self._directory), f"{glob.escape(self._pokemon_name)}_"
+                               f"{glob.escape(self._pokeball_type)}_{'[0-9a-f]' * 32}.npy")
+        for stale_path in glob.glob(pattern):
+            if stale_path != path:
+                os.remove(stale_path)
+        return table
+
+
+_TABLES: Dict[Tuple[str, str, str, str], CaptureRateTable] = {}
+
+
+def get_capture_rate_table(
+    pokemon_name: str,
+    pokeball_type: str,
+    directory="lookup_tables",
+    src_file="pokemon.json",
+) -> CaptureRateTable:
+    # Keyed by the arguments as given, resolving the path on every lookup would
+    # cost more than the lookup itself
+    key = (pokemon_name.lower(), pokeball_type, directory, src_file)
+    table = _TABLES.get(key)
+    if table is None:
+        table = _TABLES[key] = CaptureRateTable(pokemon_name, pokeball_type, directory, src_file)
+    return table
+
+
+def lookup_capture_rate(
+    pokemon_name: str,
+    pokeball_type: str,
+    level: int,
+    hp_percentage: int,
+    status: StatusEffect,
+    directory="lookup_tables",
+    src_file="pokemon.json",
+) -> float:
+    """Capture rate of attempt_catch without noise, read from a lookup table
+
+    Used by `main.py rate --lookup-tables DIR`. The first query of a species
+    and pokeball computes its whole table, the following ones only index it.
+
+    Parameters
+    ----------
+    pokemon_name::[str]
+        Species of the pokemon being caught
+    pokeball_type::[str]
+        The type of pokeball to use
+    level::[int]
+        Level of the pokemon, between 1 and 100
+    hp_percentage::[int]
+        Remaining hp of the pokemon, as an integer percentage between 0 and 100
+    status::[StatusEffect]
+        Status effect of the pokemon
+    directory::[str]
+        Directory the tables are saved in
+    src_file::[str]
+        Species database the tables are computed from
+
+    Returns
+    -------
+    capture_rate::float
+        The probability of the pokemon being caught
+    """
+    table = get_capture_rate_table(pokemon_name, pokeball_type, directory, src_file)
+    return table.query(level, hp_percentage, status)
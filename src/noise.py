@@ -0,0 +1,62 @@
+import math
+from typing import Callable, Dict
+
+import numpy as np
+
+from .rng import CatchRNG
+
+# A noise model draws the multipliers applied to the capture rate of a throw.
+# It receives the generator, the noise level (the standard deviation of the
+# multiplier, a float or an array broadcast against size) and the size of the
+# bulk draw, None for a single float. Every model has mean 1 and never returns
+# a negative multiplier.
+NoiseModel = Callable[..., "float | np.ndarray"]
+
+
+def normal_noise(rng: CatchRNG, scale, size=None):
+    # Negative multipliers are clipped to 0, as attempt_catch always did
+    if size is None:
+        return max(rng.normal(1, scale), 0)
+    return np.maximum(rng.normal(1, scale, size), 0)
+
+
+def truncated_normal_noise(rng: CatchRNG, scale, size=None):
+    # Negative multipliers are drawn again instead of clipped
+    if size is None:
+        multiplier = rng.normal(1, scale)
+        while multiplier < 0:
+            multiplier = rng.normal(1, scale)
+        return multiplier
+
+    scale = np.broadcast_to(scale, size)
+    multiplier = rng.normal(1, scale, size)
+    negative = multiplier < 0
+    while negative.any():
+        redraw_scale = scale[negative]
+        multiplier[negative] = rng.normal(1, redraw_scale, redraw_scale.shape)
+        negative = multiplier < 0
+    return multiplier
+
+
+def lognormal_noise(rng: CatchRNG, scale, size=None):
+    # exp(N(-sigma^2 / 2, sigma)) has mean 1, and with sigma^2 = log(1 + scale^2)
+    # its standard deviation is exactly the noise level
+    if size is None:
+        sigma = math.sqrt(math.log1p(scale**2))
+        return math.exp(sigma * rng.standard_normal() - sigma**2 / 2)
+
+    sigma = np.sqrt(np.log1p(np.square(scale)))
+    return np.exp(sigma * rng.normal(0, 1, size) - sigma**2 / 2)
+
+
+NOISE_MODELS: Dict[str, NoiseModel] = {
+    "normal": normal_noise,
+    "truncated_normal": truncated_normal_noise,
+    "lognormal": lognormal_noise,
+}
+
+
+def get_noise_model(noise_model: str) -> NoiseModel:
+    if noise_model not in NOISE_MODELS:
+        raise ValueError("Invalid noise model")
+    return NOISE_MODELS[noise_model]
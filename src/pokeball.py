@@ -1,7 +1,50 @@
+import json
+import os
 from abc import ABC
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
 
 from .pokemon import Pokemon
 
+# A catch rate modifier is a pure function of the species arrays
+# (catch_rate, weight, speed) returning the catch rate a ball sees. They work
+# on scalars and on arrays of any shape, so the same function serves a single
+# throw and a whole grid of them.
+Modifier = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def species_catch_rate(catch_rate, weight, speed) -> np.ndarray:
+    return np.asarray(catch_rate, dtype=float)
+
+
+def speed_modifier(threshold=100, multiplier=4) -> Modifier:
+    # Multiplies the catch rate of the species at least as fast as threshold
+    def modifier(catch_rate, weight, speed):
+        factor = np.where(np.asarray(speed) >= threshold, multiplier, 1)
+        return factor * np.asarray(catch_rate, dtype=float)
+
+    return modifier
+
+
+def weight_modifier(
+    brackets: Sequence[Tuple[float, float]] = ((903, 40), (677.3, 30), (451.5, 20)),
+    default=-20,
+    minimum=1,
+) -> Modifier:
+    # Adds the bonus of the first (weight, bonus) bracket the species is
+    # heavier than, brackets go from the heaviest to the lightest
+    def modifier(catch_rate, weight, speed):
+        weight = np.asarray(weight)
+        bonus = np.select(
+            [weight > limit for limit, _ in brackets], [bonus for _, bonus in brackets], default=default
+        )
+        catch_rate = np.asarray(catch_rate, dtype=float) + bonus
+
+        return np.where(catch_rate > 0, catch_rate, minimum)
+
+    return modifier
+
 
 # ABC denotes abstract class,  this is not instantiable
 # Everything could extend from Pokeball in this case, but I wanted to showcase
@@ -23,9 +66,14 @@ class BasePokeball(ABC):
     def ball_rate(self):
         return self._ball_rate
 
+    # Catch rate modifier of the ball, receives one array per species attribute
+    # so many throws can be evaluated without instantiating balls
+    batch_catch_rate = staticmethod(species_catch_rate)
+
     @property
     def catch_rate(self):
-        return self._catching_pkmn.catch_rate
+        pokemon = self._catching_pkmn
+        return float(self.batch_catch_rate(pokemon.catch_rate, pokemon.weight, pokemon.stats.speed))
 
 
 class PokeBall(BasePokeball):
@@ -35,10 +83,11 @@ class PokeBall(BasePokeball):
 
 
 class UltraBall(BasePokeball):
+    _ball_rate = 2
+
     def __init__(self, catching_pkmn: Pokemon):
         super().__init__(catching_pkmn)
         self._name = "Ultraball"
-        self._ball_rate = 2
 
 
 class FastBall(BasePokeball):
@@ -47,13 +96,7 @@ class FastBall(BasePokeball):
         self._name = "FastBall"
 
     # This pokeball affects the catch rate based on the pokemon's speed
-    @property
-    def catch_rate(self):
-        modifier = 1
-        if self._catching_pkmn.stats.speed >= 100:
-            modifier = 4
-
-        return modifier * self._catching_pkmn.catch_rate
+    batch_catch_rate = staticmethod(speed_modifier(100, 4))
 
 
 class HeavyBall(BasePokeball):
@@ -62,16 +105,109 @@ class HeavyBall(BasePokeball):
         self._name = "HeavyBall"
 
     # This pokeball affects the catch rate based on the pokemon's weight
-    @property
-    def catch_rate(self):
-        modifier = -20
-        if self._catching_pkmn.weight > 451.5:
-            modifier = 20
-        if self._catching_pkmn.weight > 677.3:
-            modifier = 30
-        if self._catching_pkmn.weight > 903:
-            modifier = 40
+    batch_catch_rate = staticmethod(weight_modifier())
+
+
+class BallStrategy:
+    """A pokeball described by its ball rate and its catch rate modifier
+
+    Unlike the classes above nothing is instantiated per throw. The catch rate
+    of a single pokemon only depends on its species, so it is computed once
+    per species and reused.
+    """
+
+    __slots__ = ("name", "ball_rate", "modifier", "_species_catch_rates")
+
+    def __init__(self, name: str, ball_rate: float = 1, modifier: Modifier = species_catch_rate):
+        self.name = name
+        self.ball_rate = ball_rate
+        self.modifier = modifier
+        self._species_catch_rates: Dict[Tuple[float, float, float], float] = {}
+
+    def __repr__(self):
+        return f"{self.name} (ball_rate={self.ball_rate})"
+
+    def catch_rate(self, pokemon: Pokemon) -> float:
+        species = (pokemon.catch_rate, pokemon.weight, pokemon.stats.speed)
+        catch_rate = self._species_catch_rates.get(species)
+        if catch_rate is None:
+            catch_rate = float(self.modifier(*species))
+            self._species_catch_rates[species] = catch_rate
+        return catch_rate
+
+    def batch_catch_rate(self, catch_rate, weight, speed) -> np.ndarray:
+        return self.modifier(catch_rate, weight, speed)
+
+
+_STRATEGIES: Dict[str, BallStrategy] = {}
+
+
+def register_pokeball(name: str, ball_rate: float = 1, modifier: Modifier = species_catch_rate) -> BallStrategy:
+    strategy = BallStrategy(name, ball_rate, modifier)
+    _STRATEGIES[name] = strategy
+    return strategy
+
+
+def get_pokeball(name: str) -> BallStrategy:
+    if name not in _STRATEGIES:
+        raise ValueError("Invalid pokeball type")
+    return _STRATEGIES[name]
+
+
+def pokeball_names() -> List[str]:
+    return list(_STRATEGIES)
+
+
+for _ball in (PokeBall, UltraBall, FastBall, HeavyBall):
+    register_pokeball(_ball.__name__.lower(), _ball._ball_rate, _ball.batch_catch_rate)
+
+_LOADED_FILES: Dict[str, int] = {}
+
+
+def load_pokeballs(src_file="pokeball.json") -> List[str]:
+    """Registers the pokeballs of a pokeball.json file
+
+    A value can be the name of an already registered pokeball, or an object
+    describing a custom one without writing a class:
+
+        "greatball": {"ball_rate": 1.5}
+        "quickball": {"ball_rate": 1, "speed": {"threshold": 90, "multiplier": 3}}
+        "megaball": {"weight": {"brackets": [[500, 10]], "default": 0}}
+
+    "speed" and "weight" take the arguments of speed_modifier and
+    weight_modifier, a pokeball has at most one of them. Invalid definitions
+    raise a ValueError naming the pokeball. The file is only read again when
+    it changes.
+
+    Returns
+    -------
+    names::List[str]
+        Pokeballs of the file, in order
+    """
+    path = os.path.abspath(src_file)
+    with open(path, "r") as file:
+        mtime = os.fstat(file.fileno()).st_mtime_ns
+        pokeballs = json.load(file)
+    if _LOADED_FILES.get(path) == mtime:
+        return list(pokeballs)
+
+    for name, definition in pokeballs.items():
+        if isinstance(definition, str):
+            base = get_pokeball(definition)
+            register_pokeball(name, base.ball_rate, base.modifier)
+            continue
+
+        if not isinstance(definition, dict):
+            raise ValueError(f"Pokeball {name} has to be the name of a pokeball or an object")
+        if "speed" in definition and "weight" in definition:
+            raise ValueError(f"Pokeball {name} can not have both a speed and a weight modifier")
 
-        catch_rate = self._catching_pkmn.catch_rate + modifier
+        modifier = species_catch_rate
+        if "speed" in definition:
+            modifier = speed_modifier(**definition["speed"])
+        elif "weight" in definition:
+            modifier = weight_modifier(**definition["weight"])
+        register_pokeball(name, definition.get("ball_rate", 1), modifier)
 
-        return catch_rate if catch_rate > 0 else 1
+    _LOADED_FILES[path] = mtime
+    return list(pokeballs)
@@ -1,7 +1,12 @@
 import json
 import math
+import os
 from enum import Enum
-from typing import NamedTuple, Tuple
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from .instrumentation import instrumented
 
 
 class Type(str, Enum):
@@ -45,6 +50,18 @@ class StatusEffect(Enum):
 
 
 class Pokemon:
+    # No per-instance __dict__, large populations of pokemon are common
+    __slots__ = (
+        "_name",
+        "_type",
+        "_stats",
+        "_catch_rate",
+        "_weight",
+        "current_hp",
+        "status_effect",
+        "level",
+    )
+
     def __init__(
         self,
         name: str,
@@ -96,30 +113,197 @@ class Pokemon:
         return math.floor(0.01 * (2 * base_hp) + level + 10)
 
 
+class PokemonBatch:
+    """Many pokemon stored as one NumPy array per attribute
+
+    Only the attributes used by the capture formula are kept, the status
+    effect is stored as its catch multiplier.
+    """
+
+    __slots__ = (
+        "base_hp",
+        "level",
+        "current_hp",
+        "status",
+        "catch_rate",
+        "weight",
+        "speed",
+    )
+
+    def __init__(self, base_hp, level, current_hp, status, catch_rate, weight, speed):
+        (
+            self.base_hp,
+            self.level,
+            self.current_hp,
+            self.status,
+            self.catch_rate,
+            self.weight,
+            self.speed,
+        ) = np.broadcast_arrays(
+            *(
+                np.asarray(column, dtype=float)
+                for column in (base_hp, level, current_hp, status, catch_rate, weight, speed)
+            )
+        )
+
+    def __len__(self):
+        return self.level.size
+
+    @property
+    def shape(self):
+        return self.level.shape
+
+    @property
+    def max_hp(self):
+        # Same simplification as Pokemon.max_hp
+        return np.floor(0.01 * (2 * self.base_hp) + self.level + 10)
+
+    @classmethod
+    def from_pokemon(cls, pokemons: Sequence[Pokemon]) -> "PokemonBatch":
+        return cls(
+            [pokemon.stats.hp for pokemon in pokemons],
+            [pokemon.level for pokemon in pokemons],
+            [pokemon.current_hp for pokemon in pokemons],
+            [pokemon.status_effect.value[1] for pokemon in pokemons],
+            [pokemon.catch_rate for pokemon in pokemons],
+            [pokemon.weight for pokemon in pokemons],
+            [pokemon.stats.speed for pokemon in pokemons],
+        )
+
+
+class Species(NamedTuple):
+    name: str
+    type: Tuple[Type, Type]
+    stats: Stats
+    catch_rate: int
+    weight: float
+
+
+class SpeciesRegistry:
+    """In-memory copy of a species database file
+
+    The file is parsed once and kept as immutable Species records, it is only
+    read again when its modification time changes.
+    """
+
+    def __init__(self, src_file="pokemon.json"):
+        self._src_file = src_file
+        self._mtime = None
+        self._generation = 0
+        self._species: Dict[str, Species] = {}
+
+    def _refresh(self):
+        mtime = os.stat(self._src_file).st_mtime_ns
+        if mtime == self._mtime:
+            return
+
+        with open(self._src_file, "r") as c:
+            pokemon_db = json.load(c)
+
+        species = {}
+        for name, poke in pokemon_db.items():
+            t1, t2 = poke["type"]
+            species[name.lower()] = Species(
+                name,
+                (Type(t1.lower()), Type(t2.lower())),
+                Stats(*poke["stats"]),
+                poke["catch_rate"],
+                poke["weight"],
+            )
+        self._species = species
+        self._mtime = mtime
+        self._generation += 1
+
+    def get(self, name: str) -> Species:
+        self._refresh()
+        if name.lower() not in self._species:
+            raise ValueError("Not a valid pokemon")
+        return self._species[name.lower()]
+
+    def names(self) -> List[str]:
+        self._refresh()
+        return [species.name for species in self._species.values()]
+
+    @property
+    def generation(self) -> int:
+        # Number of times the file was read, what is derived from the records
+        # only has to be computed again when it changes
+        self._refresh()
+        return self._generation
+
+
+_REGISTRIES: Dict[str, SpeciesRegistry] = {}
+
+
+def get_species_registry(src_file="pokemon.json") -> SpeciesRegistry:
+    # One registry per database file, shared by every factory reading it
+    path = os.path.abspath(src_file)
+    if path not in _REGISTRIES:
+        _REGISTRIES[path] = SpeciesRegistry(path)
+    return _REGISTRIES[path]
+
+
 class PokemonFactory:
     def __init__(self, src_file="pokemon.json"):
         self._src_file = src_file
+        self._registry = get_species_registry(src_file)
 
+    @instrumented("PokemonFactory.create")
     def create(
         self, name: str, level: int, status: StatusEffect, hp_percentage: float
     ) -> Pokemon:
         if hp_percentage < 0 or hp_percentage > 1:
             raise ValueError("hp has to be value between 0 and 1")
-        with open(self._src_file, "r") as c:
-            pokemon_db = json.load(c)
-            if name.lower() not in pokemon_db:
-                raise ValueError("Not a valid pokemon")
-            poke = pokemon_db[name]
+        species = self._registry.get(name)
 
-            t1, t2 = poke["type"]
-            type = (Type(t1.lower()), Type(t2.lower()))
-            stats = Stats(*poke["stats"])
+        new_pokemon = Pokemon(
+            name,
+            species.type,
+            0,
+            status,
+            level,
+            species.stats,
+            species.catch_rate,
+            species.weight,
+        )
 
-            new_pokemon = Pokemon(
-                name, type, 0, status, level, stats, poke["catch_rate"], poke["weight"]
-            )
+        max_hp = new_pokemon.max_hp
+        hp = math.floor(hp_percentage * max_hp)
+        new_pokemon.current_hp = hp if hp > 0 else 1
+        return new_pokemon
+
+    def create_batch(
+        self,
+        names: Sequence[str],
+        levels: Sequence[int],
+        statuses: Sequence[StatusEffect],
+        hp_percentages: Sequence[float],
+    ) -> PokemonBatch:
+        # Arguments are broadcast against each other like NumPy arrays
+        hp_percentages = np.asarray(hp_percentages, dtype=float)
+        if np.any((hp_percentages < 0) | (hp_percentages > 1)):
+            raise ValueError("hp has to be value between 0 and 1")
+
+        # Species and statuses are resolved once per distinct value and then
+        # scattered back, so scalars are never expanded into Python objects
+        species, species_idx = np.unique(
+            np.char.lower(np.asarray(names, dtype=str)), return_inverse=True
+        )
+        species_idx = species_idx.reshape(np.shape(names))
+        records = [self._registry.get(name) for name in species]
+
+        statuses = np.asarray(statuses, dtype=object)
+        status = np.array([s.value[1] for s in statuses.ravel()], dtype=float)
 
-            max_hp = new_pokemon.max_hp
-            hp = math.floor(hp_percentage * max_hp)
-            new_pokemon.current_hp = hp if hp > 0 else 1
-            return new_pokemon
+        # current_hp holds the hp percentage until max_hp is known
+        batch = PokemonBatch(
+            np.array([record.stats.hp for record in records])[species_idx],
+            levels,
+            hp_percentages,
+            status.reshape(statuses.shape),
+            np.array([record.catch_rate for record in records])[species_idx],
+            np.array([record.weight for record in records])[species_idx],
+            np.array([record.stats.speed for record in records])[species_idx],
+        )
+        batch.current_hp = np.maximum(np.floor(batch.current_hp * batch.max_hp), 1)
+        return batch
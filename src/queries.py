@@ -0,0 +1,75 @@
+import math
+from typing import AbstractSet, Any, Dict, NamedTuple, Sequence
+
+import numpy as np
+
+from src.catching import raw_capture_rate_batch
+from src.pokeball import get_pokeball
+from src.pokemon import PokemonFactory, SpeciesRegistry, StatusEffect
+
+# Capture rate queries shared by the service (src/service.py) and the bulk
+# mode (src/bulk.py): "probability of catching `pokemon` at `level`, `status`
+# and `hp` with `pokeball`", evaluated many at once by the batch engine.
+
+
+class RateQuery(NamedTuple):
+    pokemon: str
+    pokeball: str
+    level: int
+    status: StatusEffect
+    hp: float
+
+
+def species_names(registry: SpeciesRegistry) -> AbstractSet[str]:
+    # Lower case names parse_query accepts, taken once for many queries
+    return {name.lower() for name in registry.names()}
+
+
+def parse_query(species: AbstractSet[str], params: Dict[str, Any]) -> RateQuery:
+    # Validated one by one, so a bad query does not fail the rest of its batch
+    def param(name, default=None):
+        value = params.get(name)
+        if value is None or value == "":
+            if default is None:
+                raise ValueError(f"Missing parameter {name}")
+            return default
+        return value
+
+    pokemon, pokeball = str(param("pokemon")), str(param("pokeball"))
+    if pokemon.lower() not in species:
+        raise ValueError("Not a valid pokemon")
+    get_pokeball(pokeball)
+
+    try:
+        level, hp = param("level", 100), param("hp", 1)
+        # JSON booleans are ints to Python and int() truncates floats, neither
+        # is a level or an hp
+        if isinstance(level, bool) or isinstance(hp, bool):
+            raise ValueError
+        if isinstance(level, float) and not level.is_integer():
+            raise ValueError
+        level = int(level)
+        hp = float(hp)
+        status = StatusEffect[str(param("status", "none")).upper()]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise ValueError("Invalid level, hp or status")
+    if level < 1 or level > 100:
+        raise ValueError("level has to be between 1 and 100")
+    # NaN fails every comparison, so it has to be rejected explicitly
+    if not math.isfinite(hp) or hp < 0 or hp > 1:
+        raise ValueError("hp has to be value between 0 and 1")
+    return RateQuery(pokemon, pokeball, level, status, hp)
+
+
+def evaluate_queries(factory: PokemonFactory, queries: Sequence[RateQuery]) -> np.ndarray:
+    # create_batch resolves each distinct species once and the batch engine
+    # evaluates each distinct pokeball with one vectorized call, so the queries
+    # are grouped by species and ball without reordering them
+    pokemons = factory.create_batch(
+        [query.pokemon for query in queries],
+        [query.level for query in queries],
+        [query.status for query in queries],
+        [query.hp for query in queries],
+    )
+    # Only the rates are needed, so no throw is drawn from the shared generator
+    return np.minimum(raw_capture_rate_batch(pokemons, [query.pokeball for query in queries]), 1)
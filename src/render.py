@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple
+
+import matplotlib
+
+# Figures are only ever saved to files, the non interactive Agg backend works
+# on servers without a display and is the cheapest one to start
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+
+class FigureJob(NamedTuple):
+    plot: Callable  # Module level function, so it can be sent to another process
+    args: tuple = ()
+    kwargs: dict = {}
+
+
+def _use_agg() -> None:
+    # pyplot may have been imported with another backend before this module
+    plt.switch_backend("Agg")
+
+
+def _render(job: FigureJob) -> Any:
+    try:
+        return job.plot(*job.args, **job.kwargs)
+    finally:
+        plt.close("all")
+
+
+def render_figures(jobs: Iterable[FigureJob], workers=None) -> List[Any]:
+    """Renders figures from precomputed result tables across a pool of processes
+
+    Every job is a plot function and its arguments, the tables are sent to the
+    workers so only the drawing and saving happens there.
+
+    Parameters
+    ----------
+    jobs::[Iterable[FigureJob]]
+        Figures to render, each one has to draw its own figure and save it
+    workers::[int]
+        Number of processes, defaults to one per CPU. With 1 the figures are
+        rendered in the current process
+
+    Returns
+    -------
+    results::List[Any]
+        Value returned by each plot function, in the order of jobs
+    """
+    jobs = list(jobs)
+    workers = min(workers or os.cpu_count(), len(jobs) or 1)
+    if workers == 1:
+        _use_agg()
+        return [_render(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg) as executor:
+        return list(executor.map(_render, jobs))
@@ -0,0 +1,47 @@
+import os
+from typing import Iterable, List
+
+import pandas as pd
+
+
+class ResultCollector:
+    """Accumulates result rows in one list per column
+
+    Rows are appended as plain tuples and the DataFrame is built only once,
+    when to_frame is called, instead of concatenating a frame per row.
+    """
+
+    def __init__(self, columns: List[str]):
+        self._columns = {column: [] for column in columns}
+
+    def __len__(self):
+        return len(next(iter(self._columns.values()), []))
+
+    def append(self, *row):
+        if len(row) != len(self._columns):
+            raise ValueError(f"Expected {len(self._columns)} values, got {len(row)}")
+        for values, value in zip(self._columns.values(), row):
+            values.append(value)
+
+    def extend(self, rows: Iterable[tuple]):
+        for row in rows:
+            self.append(*row)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._columns)
+
+    def export(self, file_path: str) -> pd.DataFrame:
+        df = self.to_frame()
+        export_frame(df, file_path)
+        return df
+
+
+def export_frame(df: pd.DataFrame, file_path: str) -> None:
+    # The format is taken from the extension, parquet needs pyarrow or fastparquet
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    if file_path.endswith(".csv"):
+        df.to_csv(file_path, index=False)
+    elif file_path.endswith(".parquet"):
+        df.to_parquet(file_path, index=False)
+    else:
+        raise ValueError("Unsupported export format, use .csv or .parquet")
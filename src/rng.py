@@ -0,0 +1,58 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+class CatchRNG:
+    """Random number source of the catching simulations
+
+    Wraps a numpy Generator built from a SeedSequence, so the same seed always
+    gives the same throws and independent streams can be handed to parallel
+    workers with spawn. Single draws are served from buffers refilled in bulk,
+    which avoids one NumPy call per throw.
+    """
+
+    def __init__(self, seed: Union[None, int, np.random.SeedSequence] = None, buffer_size=4096):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self._seed_sequence = seed
+        self._buffer_size = buffer_size
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+
+        self._uniforms: List[float] = []
+        self._normals: List[float] = []
+
+    def spawn(self, n: int) -> List["CatchRNG"]:
+        return [CatchRNG(child, self._buffer_size) for child in self._seed_sequence.spawn(n)]
+
+    def uniform(self) -> float:
+        # Uniform value in [0, 1)
+        if not self._uniforms:
+            self._uniforms = self.generator.random(self._buffer_size).tolist()
+        return self._uniforms.pop()
+
+    def standard_normal(self) -> float:
+        if not self._normals:
+            self._normals = self.generator.standard_normal(self._buffer_size).tolist()
+        return self._normals.pop()
+
+    def random(self, size) -> np.ndarray:
+        return self.generator.random(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if size is None:
+            return loc + scale * self.standard_normal()
+        return self.generator.normal(loc, scale, size)
+
+
+_default_rng = CatchRNG(42)
+
+
+def default_rng() -> CatchRNG:
+    # Shared by every function called without an explicit rng
+    return _default_rng
+
+
+def seed(value: Optional[int] = None) -> None:
+    global _default_rng
+    _default_rng = CatchRNG(value)
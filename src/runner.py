@@ -0,0 +1,193 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import instrumentation
+from src.pokeball import load_pokeballs
+from src.pokemon import PokemonFactory
+from src.rng import CatchRNG
+from src.render import FigureJob, render_figures
+from src.results import ResultCollector, export_frame
+from src import utils
+
+
+class Analysis(NamedTuple):
+    rows: Callable  # (factory, pokeball, pokemon_name, rng=None) -> list of rows
+    columns: List[str]
+    plot: Callable  # (pokemon_df, pokeballs, pokemon_name) -> None
+    sampled: bool  # Whether rows accepts the analytic flag
+    file_name: str  # Name of the exported results, formatted with the pokemon
+
+
+ANALYSES: Dict[str, Analysis] = {
+    "health": Analysis(
+        utils.health_and_capture_rows,
+        utils.HEALTH_COLUMNS,
+        utils.plot_health_and_capture,
+        True,
+        "health_capture_{}",
+    ),
+    "hp": Analysis(
+        utils.hp_and_capture_rows,
+        utils.HP_COLUMNS,
+        utils.plot_hp_and_capture,
+        True,
+        "hp_capture_{}",
+    ),
+    "level": Analysis(
+        utils.level_and_capture_rows,
+        utils.LEVEL_COLUMNS,
+        utils.plot_level_and_capture,
+        False,
+        "level_capture_{}",
+    ),
+    "level_capture_rate": Analysis(
+        utils.level_and_capture_with_capture_rate_rows,
+        utils.LEVEL_CAPTURE_RATE_COLUMNS,
+        utils.plot_level_and_capture_with_capture_rate,
+        False,
+        "level_capture_{}_with_capture_rate",
+    ),
+    "hp_capture_rate": Analysis(
+        utils.hp_and_capture_with_capture_rate_rows,
+        utils.HP_CAPTURE_RATE_COLUMNS,
+        utils.plot_hp_and_capture_with_capture_rate,
+        False,
+        "hp_capture_{}_with_capture_rate",
+    ),
+    "status_capture_rate": Analysis(
+        utils.status_and_capture_with_capture_rate_rows,
+        utils.STATUS_CAPTURE_RATE_COLUMNS,
+        utils.plot_status_and_capture_with_capture_rate,
+        False,
+        "health_capture_{}_with_capture_rate",
+    ),
+}
+
+
+class Task(NamedTuple):
+    analysis: str
+    pokemon_name: str
+    pokeball: str
+    seed: np.random.SeedSequence
+
+
+def _run_task(task: Task, src_file: str, pokeball_file: str, analytic: bool) -> list:
+    # Custom pokeballs have to be registered in every worker process
+    load_pokeballs(pokeball_file)
+
+    analysis = ANALYSES[task.analysis]
+    rows = analysis.rows
+    if analysis.sampled:
+        rows = partial(rows, analytic=analytic)
+    # Every task draws from its own SeedSequence, so its rows only depend on the
+    # seed and its position in the grid, not on which worker runs it or when
+    return rows(PokemonFactory(src_file), task.pokeball, task.pokemon_name, rng=CatchRNG(task.seed))
+
+
+def _run_task_instrumented(task: Task, src_file: str, pokeball_file: str, analytic: bool):
+    # Worker processes return their metrics with the rows, to be merged in the parent
+    instrumentation.enable()
+    instrumentation.reset()
+    rows = _run_task(task, src_file, pokeball_file, analytic)
+    return rows, instrumentation.snapshot()
+
+
+def run_experiments(
+    pokemon_names: Iterable[str],
+    pokeballs: Iterable[str],
+    analyses: Iterable[str] = tuple(ANALYSES),
+    workers=None,
+    seed=42,
+    src_file="pokemon.json",
+    analytic=False,
+    pokeball_file="pokeball.json",
+) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """Runs the (analysis, pokemon, pokeball) grid over a pool of processes
+
+    Parameters
+    ----------
+    pokemon_names::[Iterable[str]]
+        Pokemon to analyze
+    pokeballs::[Iterable[str]]
+        Pokeballs to throw at each pokemon
+    analyses::[Iterable[str]]
+        Keys of ANALYSES to run
+    workers::[int]
+        Number of processes, defaults to one per CPU. With 1 everything runs
+        in the current process
+    seed::[int]
+        Root seed, the results are the same for any number of workers
+    src_file::[str]
+        Species database the pokemon are read from
+    analytic::[bool]
+        Use the exact capture probability in the analyses that sample it
+    pokeball_file::[str]
+        File the custom pokeballs are registered from (see load_pokeballs)
+
+    Returns
+    -------
+    results::Dict[Tuple[str, str], pd.DataFrame]
+        Rows of every pokeball, keyed by (analysis, pokemon)
+    """
+    pokemon_names, pokeballs, analyses = list(pokemon_names), list(pokeballs), list(analyses)
+    grid = [
+        (analysis, pokemon_name, pokeball)
+        for analysis in analyses
+        for pokemon_name in pokemon_names
+        for pokeball in pokeballs
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(grid))
+    tasks = [Task(*cell, task_seed) for cell, task_seed in zip(grid, seeds)]
+
+    run_task = partial(_run_task, src_file=src_file, pokeball_file=pokeball_file, analytic=analytic)
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        task_rows = list(map(run_task, tasks))
+    elif instrumentation.is_enabled():
+        run_task = partial(_run_task_instrumented, src_file=src_file, pokeball_file=pokeball_file, analytic=analytic)
+        # Workers started without a copy of this process enable it before they
+        # import the instrumented modules to run their first task
+        with ProcessPoolExecutor(max_workers=workers, initializer=instrumentation.enable) as executor:
+            task_rows = []
+            for rows, metrics in executor.map(run_task, tasks):
+                task_rows.append(rows)
+                instrumentation.merge(metrics)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            task_rows = list(executor.map(run_task, tasks))
+
+    results: Dict[Tuple[str, str], ResultCollector] = {}
+    for task, result in zip(tasks, task_rows):
+        key = (task.analysis, task.pokemon_name)
+        if key not in results:
+            results[key] = ResultCollector(ANALYSES[task.analysis].columns)
+        results[key].extend(result)
+
+    return {key: collector.to_frame() for key, collector in results.items()}
+
+
+def plot_experiments(
+    results: Dict[Tuple[str, str], pd.DataFrame], pokeballs: Iterable[str], workers=None
+) -> None:
+    # One figure per (analysis, pokemon), rendered in parallel like the simulations
+    pokeballs = list(pokeballs)
+    render_figures(
+        (
+            FigureJob(ANALYSES[analysis].plot, (pokemon_df, pokeballs, pokemon_name))
+            for (analysis, pokemon_name), pokemon_df in results.items()
+        ),
+        workers,
+    )
+
+
+def export_experiments(
+    results: Dict[Tuple[str, str], pd.DataFrame], export_format="csv", output_dir=utils.RESULTS_DIR
+) -> None:
+    for (analysis, pokemon_name), pokemon_df in results.items():
+        file_name = ANALYSES[analysis].file_name.format(pokemon_name)
+        export_frame(pokemon_df, os.path.join(output_dir, f"{file_name}.{export_format}"))
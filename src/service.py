@@ -0,0 +1,197 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AbstractSet, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from src.pokeball import load_pokeballs
+from src.pokemon import PokemonFactory, get_species_registry
+from src.queries import RateQuery, evaluate_queries, parse_query, species_names
+
+# Capture rate service: answers
+#   GET /rate?pokemon=snorlax&pokeball=ultraball&level=50&status=sleep&hp=0.5
+# with {"capture_rate": ...} over HTTP, on a TCP port or a UNIX socket, and
+#   GET /stats
+# with the number of requests and batches and the latency percentiles.
+# Requests that arrive together are evaluated as a single batch.
+
+
+class LatencyStats:
+    """Latency of the latest `window` requests and their percentiles"""
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, window=10_000):
+        self._latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+
+    def record(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self.requests += 1
+
+    def summary(self) -> Dict[str, float]:
+        summary = {"requests": self.requests, "batches": self.batches}
+        if self._latencies:
+            latencies_ms = np.percentile(np.array(self._latencies) * 1000, self.PERCENTILES)
+            summary.update({f"p{p}_ms": float(value) for p, value in zip(self.PERCENTILES, latencies_ms)})
+            summary["mean_batch_size"] = self.requests / max(self.batches, 1)
+        return summary
+
+
+class CaptureRateBatcher:
+    """Gathers concurrent queries and evaluates them with one batch call
+
+    A batch is evaluated when max_batch queries are waiting or max_delay
+    seconds after its first query arrived, whichever happens first.
+    """
+
+    def __init__(self, factory: PokemonFactory, stats: LatencyStats, max_batch=256, max_delay=0.002):
+        self._factory = factory
+        self._stats = stats
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue: "asyncio.Queue[Tuple[RateQuery, asyncio.Future]]" = asyncio.Queue()
+
+    async def query(self, query: RateQuery) -> float:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            deadline = loop.time() + self._max_delay
+            while len(pending) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._evaluate(pending)
+
+    def _evaluate(self, pending: List[Tuple[RateQuery, asyncio.Future]]) -> None:
+        self._stats.batches += 1
+        try:
+            capture_rates = evaluate_queries(self._factory, [query for query, _ in pending]).tolist()
+        except Exception:
+            # Any query can fail the whole batch call, so the batch is evaluated
+            # again one query at a time and only the ones that fail get the error
+            for query, future in pending:
+                try:
+                    self._resolve(future, evaluate_queries(self._factory, [query]).tolist()[0])
+                except Exception as error:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        for (_, future), capture_rate in zip(pending, capture_rates):
+            self._resolve(future, capture_rate)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, capture_rate: float) -> None:
+        # The request may have been cancelled while its batch was evaluated
+        if not future.done():
+            future.set_result(capture_rate)
+
+
+class CaptureRateService:
+    def __init__(self, src_file="pokemon.json", pokeball_file="pokeball.json", max_batch=256, max_delay=0.002):
+        load_pokeballs(pokeball_file)
+        self.registry = get_species_registry(src_file)
+        self._species = (None, frozenset())  # (registry generation, species_names)
+        self.factory = PokemonFactory(src_file)
+        self.stats = LatencyStats()
+        self.batcher = CaptureRateBatcher(self.factory, self.stats, max_batch, max_delay)
+
+    def species(self) -> AbstractSet[str]:
+        # Built again only when the registry reads the database again
+        generation = self.registry.generation
+        if generation != self._species[0]:
+            self._species = (generation, species_names(self.registry))
+        return self._species[1]
+
+    async def _respond(self, method: str, target: str) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        if method != "GET":
+            return 405, {"error": "Only GET is supported"}
+        if url.path == "/stats":
+            return 200, self.stats.summary()
+        if url.path != "/rate":
+            return 404, {"error": "Not found"}
+
+        try:
+            query = parse_query(self.species(), {name: values[0] for name, values in parse_qs(url.query).items()})
+            return 200, {"capture_rate": await self.batcher.query(query)}
+        except ValueError as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # HTTP/1.1 with keep alive, one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                target = ""
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                    status, body = await self._respond(method, target)
+                except ValueError:
+                    status, body = 400, {"error": "Malformed request"}
+
+                payload = json.dumps(body).encode()
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if status == 200 and target.startswith("/rate"):
+                    self.stats.record(time.perf_counter() - start)
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000, unix_path: Optional[str] = None) -> None:
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        batcher = asyncio.create_task(self.batcher.run())
+        print(f"Serving capture rates on {unix_path or f'http://{host}:{port}'}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+def serve(host="127.0.0.1", port=8000, unix_path=None, src_file="pokemon.json",
+          pokeball_file="pokeball.json", max_batch=256, max_delay=0.002) -> None:
+    service = CaptureRateService(src_file, pokeball_file, max_batch, max_delay)
+    try:
+        asyncio.run(service.serve(host, port, unix_path))
+    except KeyboardInterrupt:
+        pass
@@ -6,8 +6,13 @@ import os
 
 
 from src.pokemon import PokemonFactory, StatusEffect, Pokemon
+from src.pokeball import load_pokeballs
 from src.catching import attempt_catch
+from src.estimation import estimate_capture, estimate_capture_sequential, sample_capture
+from src.results import ResultCollector
+from src.instrumentation import instrumented
 
+# Pokeballs registered from pokeball.json without a color use matplotlib's cycle
 colors = {
         "pokeball": 'r',
         "fastball": 'g',
@@ -19,21 +24,22 @@ EXPERIMENTS = 100
 ATTEMPTS = 100
 
 # Ex: 1a
-def average_probability_of_capture() -> None:
+@instrumented()
+def average_probability_of_capture(analytic=False, rng=None, ci_width=None) -> None:
 
-    with open("pokemon.json", "r") as file1, open("pokeball.json", "r") as file2:
+    with open("pokemon.json", "r") as file1:
         pokemons = json.load(file1)
-        pokeballs = json.load(file2)
+        pokeballs = load_pokeballs("pokeball.json")
         factory = PokemonFactory("pokemon.json")
 
         capture_data = {} # Almacena los datos de captura para cada pokébola
     
-        for pokeball in pokeballs.keys():
+        for pokeball in pokeballs:
             print(f"Probabilidad de captura por Pokémon con {pokeball}")
             catched_counts = []  # Lista para almacenar los porcentajes por Pokémon
             for pokemon in pokemons.keys():
                 pokemon_created = factory.create(pokemon, 100, StatusEffect.NONE, 1)
-                probability = getProbabilityOfCapture(pokemon_created, pokeball, 100)
+                probability = getProbabilityOfCapture(pokemon_created, pokeball, 100, analytic, rng, ci_width)
                 catched_counts.append(probability)
                 print(f"{pokemon_created.name}: {probability}%")
             capture_data[pokeball] = catched_counts
@@ -59,11 +65,12 @@ def average_probability_of_capture() -> None:
 
 
 # Ex: 1b
-def pokeball_effectiveness() -> None:
+@instrumented()
+def pokeball_effectiveness(analytic=False, rng=None, ci_width=None) -> None:
     
-    with open("pokemon.json", "r") as file1, open("pokeball.json", "r") as file2:
+    with open("pokemon.json", "r") as file1:
         pokemons = json.load(file1)
-        pokeballs = json.load(file2)
+        pokeballs = load_pokeballs("pokeball.json")
         factory = PokemonFactory("pokemon.json")
 
         effectiveness = {}
@@ -71,8 +78,8 @@ def pokeball_effectiveness() -> None:
         for pokemon in pokemons.keys():
             pokemon_created = factory.create(pokemon, 100, StatusEffect.NONE, 1)
             effectiveness[pokemon] = {}
-            for pokeball in pokeballs.keys():
-                probability = getProbabilityOfCapture(pokemon_created, pokeball, 10000)
+            for pokeball in pokeballs:
+                probability = getProbabilityOfCapture(pokemon_created, pokeball, 10000, analytic, rng, ci_width)
                 if(pokeball == "pokeball"):
                     effectiveness[pokemon][pokeball] = round(probability,1)
                     print(f"\n{pokemon_created.name} con POKEBOLA BASICA: {probability}%")
@@ -102,18 +109,55 @@ def pokeball_effectiveness() -> None:
 
 
 
-def getProbabilityOfCapture(pokemon: Pokemon, ball: str, iterations: int) -> float:
+@instrumented()
+def getProbabilityOfCapture(pokemon: Pokemon, ball: str, iterations: int, analytic=False, rng=None, ci_width=None) -> float:
+    # The exact capture rate is known when there is no noise, no need to sample it
+    if analytic:
+        return estimate_capture(pokemon, ball, iterations, rng=rng).probability * 100
+
+    # With a target width the throws stop once the 95% interval is that narrow,
+    # iterations is then only an upper bound
+    if ci_width is not None:
+        estimate = estimate_capture_sequential(pokemon, ball, ci_width, max_trials=iterations, rng=rng)
+        print(f"{pokemon.name} con {ball}: {estimate.trials} tiros, IC95% [{estimate.lower:.4f}, {estimate.upper:.4f}]")
+        return estimate.probability * 100
+
     catched = 0
     for i in range(iterations):
-        is_catched,_ = attempt_catch(pokemon, ball)
+        is_catched,_ = attempt_catch(pokemon, ball, rng=rng)
         if is_catched:
             catched += 1
     return catched * 100 / iterations
 
+HEALTH_COLUMNS = ["pokemon", "pokeball", "status", "mean", "std_dev"]
+HP_COLUMNS = ["pokemon", "pokeball", "hp", "mean", "std_dev"]
+LEVEL_COLUMNS = ["pokemon", "pokeball", "level", "mean", "std_dev"]
+LEVEL_CAPTURE_RATE_COLUMNS = ["pokemon", "pokeball", "level", "capture_rate"]
+HP_CAPTURE_RATE_COLUMNS = ["pokemon", "pokeball", "hp", "capture_rate"]
+STATUS_CAPTURE_RATE_COLUMNS = ["pokemon", "pokeball", "status", "capture_rate"]
+
+RESULTS_DIR = "results"
+
+# Every analysis is split in a *_rows function, which simulates a single
+# (pokemon, pokeball) pair, and a plot_* function, which draws the rows of all
+# the pokeballs for a pokemon. This way the simulations can be spread across
+# processes (see src/runner.py) and only the plotting is done in one place.
+# The rows are gathered in a ResultCollector, which can also export them when
+# an export_format ("csv" or "parquet") is given. The *_rows functions draw
+# their throws from rng (a src.rng.CatchRNG), the shared one when it is None.
+
+def collect_and_export(columns, rows_by_pokeball, file_name, export_format=None):
+    results = ResultCollector(columns)
+    for rows in rows_by_pokeball:
+        results.extend(rows)
+    if export_format is None:
+        return results.to_frame()
+    return results.export(os.path.join(RESULTS_DIR, f"{file_name}.{export_format}"))
+
 # Ex: 2a
-def analyze_health_and_capture(factory, pokeballs, pokemon_name):
-    
-    pokemon_df = pd.DataFrame(columns=["pokemon", "pokeball", "status", "mean", "std_dev"])
+@instrumented()
+def health_and_capture_rows(factory, pokeball, pokemon_name, analytic=False, rng=None):
+    rows = []
 
     experiments = 100 # Number of independent experiments
     attempts = 1000 # Number of attempts per experiment
@@ -121,28 +165,19 @@ def analyze_health_and_capture(factory, pokeballs, pokemon_name):
     for status in StatusEffect:
         # Iterate through all status effects, 100 level (max), 0 hp percentage (min) are constant
         pokemon = factory.create(pokemon_name, 100, status, 0) 
-        
-        for pokeball in pokeballs:
-            capture_attempts = []
-            for _ in range(experiments):
-                catched = 0
-                for _ in range(attempts):
-                    attempt_success, capture_rate = attempt_catch(pokemon, pokeball)
-                    if attempt_success:
-                        catched += 1
-                capture_attempts.append(catched / attempts)
-            pokemon_df = pd.concat([
-                pokemon_df, 
-                pd.DataFrame([[pokemon_name, pokeball, status.name, np.mean(capture_attempts), np.std(capture_attempts)]], 
-                             columns=["pokemon", "pokeball", "status", "mean", "std_dev"])
-            ], ignore_index=True)
+        estimate = (estimate_capture if analytic else sample_capture)(pokemon, pokeball, attempts, experiments, rng=rng)
+        rows.append((pokemon_name, pokeball, status.name, estimate.mean, estimate.std_dev))
+
+    return rows
 
+def plot_health_and_capture(pokemon_df, pokeballs, pokemon_name):
     plt.figure(figsize=(10, 6))
     
     for pokeball in pokeballs:
         pokeball_df = pokemon_df[pokemon_df["pokeball"] == pokeball] 
-        plt.plot(pokeball_df["status"], pokeball_df["mean"], color=colors[pokeball], label=pokeball, marker='o')
-        plt.errorbar(pokeball_df["status"], pokeball_df["mean"], pokeball_df["std_dev"], fmt='none', color=colors[pokeball], capsize=3)
+        # Balls without a color take the next one of the cycle, once for both calls
+        line, = plt.plot(pokeball_df["status"], pokeball_df["mean"], color=colors.get(pokeball), label=pokeball, marker='o')
+        plt.errorbar(pokeball_df["status"], pokeball_df["mean"], pokeball_df["std_dev"], fmt='none', color=line.get_color(), capsize=3)
 
     plt.title(f"Precisión de captura vs Estado para {pokemon_name}")
     plt.xlabel("Estado")
@@ -150,11 +185,21 @@ def analyze_health_and_capture(factory, pokeballs, pokemon_name):
     plt.grid(True)
     plt.legend()
     plt.savefig(f"./graphs/health_capture_{pokemon_name}.png")
+    plt.close()
     print(f"Graph saved as health_capture_{pokemon_name}.png")
 
+@instrumented()
+def analyze_health_and_capture(factory, pokeballs, pokemon_name, analytic=False, export_format=None, rng=None):
+    pokemon_df = collect_and_export(
+        HEALTH_COLUMNS,
+        (health_and_capture_rows(factory, pokeball, pokemon_name, analytic, rng) for pokeball in pokeballs),
+        f"health_capture_{pokemon_name}", export_format)
+    plot_health_and_capture(pokemon_df, pokeballs, pokemon_name)
+
 # Ex: 2b
-def analyze_hp_and_capture(factory, pokeballs, pokemon_name):
-    pokemon_df = pd.DataFrame(columns=["pokemon", "pokeball", "hp", "mean", "std_dev"])
+@instrumented()
+def hp_and_capture_rows(factory, pokeball, pokemon_name, analytic=False, rng=None):
+    rows = []
 
     experiments = 100 # Number of independent experiments
     attempts = 100 # Number of attempts per experiment
@@ -163,27 +208,18 @@ def analyze_hp_and_capture(factory, pokeballs, pokemon_name):
         # Iterate through all hp percentages, 100 level (max), NONE status are constant
         hp = hp / 100
         pokemon = factory.create(pokemon_name, 100, StatusEffect.NONE, hp) 
-        
-        for pokeball in pokeballs:
-            capture_attempts = []
-            for _ in range(experiments):
-                catched = 0
-                for _ in range(attempts):
-                    attempt_success, capture_rate = attempt_catch(pokemon, pokeball)
-                    if attempt_success:
-                        catched += 1
-                capture_attempts.append(catched / attempts)
-            pokemon_df = pd.concat([
-                pokemon_df, 
-                pd.DataFrame([[pokemon_name, pokeball, hp, np.mean(capture_attempts), np.std(capture_attempts)]], 
-                             columns=["pokemon", "pokeball", "hp", "mean", "std_dev"])
-            ], ignore_index=True)
+        estimate = (estimate_capture if analytic else sample_capture)(pokemon, pokeball, attempts, experiments, rng=rng)
+        rows.append((pokemon_name, pokeball, hp, estimate.mean, estimate.std_dev))
+
+    return rows
 
+def plot_hp_and_capture(pokemon_df, pokeballs, pokemon_name):
     plt.figure(figsize=(10, 6))
     for pokeball in pokeballs:
         pokeball_df = pokemon_df[pokemon_df["pokeball"] == pokeball]
-        plt.plot(pokeball_df["hp"], pokeball_df["mean"], color=colors[pokeball], label=pokeball, marker='o')
-        plt.errorbar(pokeball_df["hp"], pokeball_df["mean"], pokeball_df["std_dev"], fmt='none', color=colors[pokeball], capsize=3)
+        # Balls without a color take the next one of the cycle, once for both calls
+        line, = plt.plot(pokeball_df["hp"], pokeball_df["mean"], color=colors.get(pokeball), label=pokeball, marker='o')
+        plt.errorbar(pokeball_df["hp"], pokeball_df["mean"], pokeball_df["std_dev"], fmt='none', color=line.get_color(), capsize=3)
 
     plt.title(f"Precisión de captura vs Porcentaje de Salud (HP) for {pokemon_name}")
     plt.xlabel("HP %")
@@ -191,161 +227,180 @@ def analyze_hp_and_capture(factory, pokeballs, pokemon_name):
     plt.grid(True)
     plt.legend()
     plt.savefig(f"./graphs/hp_capture_{pokemon_name}.png")
+    plt.close()
     print(f"Graph saved as hp_capture_{pokemon_name}.png")
 
+@instrumented()
+def analyze_hp_and_capture(factory, pokeballs, pokemon_name, analytic=False, export_format=None, rng=None):
+    pokemon_df = collect_and_export(
+        HP_COLUMNS,
+        (hp_and_capture_rows(factory, pokeball, pokemon_name, analytic, rng) for pokeball in pokeballs),
+        f"hp_capture_{pokemon_name}", export_format)
+    plot_hp_and_capture(pokemon_df, pokeballs, pokemon_name)
+
 # Ex: 2c
 ###     Variating Level    ###
-def analyze_level_and_capture(factory, pokeballs, pokemon_names):
-
-    figures = []  # Lista para almacenar las figuras
-
-    for name in pokemon_names:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for ball in pokeballs:
-            prob = []
-            avg_prob_by_level = []
-            std_prob_by_level = []
-            levels = []
-
-            for level in [1] + list(range(10, 101, 5)):
-
-                for _ in range(ATTEMPTS):
-                    captures = 0
-                    for _ in range(EXPERIMENTS):
-                        pokemon = factory.create(name, level, StatusEffect.NONE, 0.5)
-                        success, catch_prob = attempt_catch(pokemon, ball)
-                        if success:
-                            captures += 1
-                    prob.append(captures / EXPERIMENTS)
-
-                levels.append(level)
-                avg_prob_by_level.append(np.mean(prob))
-                std_prob_by_level.append(np.std(prob))
-
-            ax.errorbar(levels, avg_prob_by_level, yerr=std_prob_by_level, 
-                        label=ball, marker='o', capsize=5, capthick=1)
-
-        ax.set_title(f"Probabilidad de captura vs Nivel para {name}")
-        ax.set_xlabel("Nivel")
-        ax.set_ylabel("Probabilidad de captura")
-        ax.grid(True)
-        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
-
-        figures.append((fig, name))  # Guardar figura en memoria
-
-    # Guardar todas las imágenes al final
-    output_dir = "graphs"
-    os.makedirs(output_dir, exist_ok=True)
+@instrumented()
+def level_and_capture_rows(factory, ball, name, rng=None):
+    rows = []
+    prob = []
 
-    for fig, name in figures:
-        output_path = os.path.join(output_dir, f"level_capture_{name}.png")
-        fig.savefig(output_path, bbox_inches="tight")
-        plt.close(fig)  # Cerrar figura para liberar memoria
+    for level in [1] + list(range(10, 101, 5)):
 
+        for _ in range(ATTEMPTS):
+            captures = 0
+            for _ in range(EXPERIMENTS):
+                pokemon = factory.create(name, level, StatusEffect.NONE, 0.5)
+                success, catch_prob = attempt_catch(pokemon, ball, rng=rng)
+                if success:
+                    captures += 1
+            prob.append(captures / EXPERIMENTS)
 
-def analyze_level_and_capture_with_capture_rate(factory, pokeballs, pokemon_names):
-    figures = []  # Lista para almacenar las figuras
-    for name in pokemon_names:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for ball in pokeballs:
-            prob = []
-            levels = []
+        rows.append((name, ball, level, np.mean(prob), np.std(prob)))
 
-            for level in [1] + list(range(10, 101, 5)):
-                pokemon = factory.create(name, level, StatusEffect.NONE, 0.5)
-                success, catch_prob = attempt_catch(pokemon, ball)
-                prob.append(catch_prob)
-                levels.append(level)
+    return rows
 
-            ax.plot(levels, prob, color=colors[ball], label=ball, marker='o')
+def plot_level_and_capture(pokemon_df, pokeballs, name):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for ball in pokeballs:
+        ball_df = pokemon_df[pokemon_df["pokeball"] == ball]
+        ax.errorbar(ball_df["level"], ball_df["mean"], yerr=ball_df["std_dev"], 
+                    label=ball, marker='o', capsize=5, capthick=1)
 
-        ax.set_title(f"Probabilidad de captura vs Nivel para %s " % name)
-        ax.set_xlabel("Nivel")
-        ax.set_ylabel("Probabilidad de captura")
-        ax.grid(True)
-        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
-        
-        figures.append((fig, name))  # Guardar figura en memoria
+    ax.set_title(f"Probabilidad de captura vs Nivel para {name}")
+    ax.set_xlabel("Nivel")
+    ax.set_ylabel("Probabilidad de captura")
+    ax.grid(True)
+    ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-    # Guardar todas las imágenes al final
     output_dir = "graphs"
     os.makedirs(output_dir, exist_ok=True)
 
-    for fig, name in figures:
-        output_path = os.path.join(output_dir, f"level_capture_{name}_with_capture_rate.png")
-        fig.savefig(output_path, bbox_inches="tight")
-        plt.close(fig)  # Cerrar figura para liberar memoria
+    output_path = os.path.join(output_dir, f"level_capture_{name}.png")
+    fig.savefig(output_path, bbox_inches="tight")
+    plt.close(fig)  # Cerrar figura para liberar memoria
 
+@instrumented()
+def analyze_level_and_capture(factory, pokeballs, pokemon_names, export_format=None, rng=None):
+    for name in pokemon_names:
+        pokemon_df = collect_and_export(
+            LEVEL_COLUMNS,
+            (level_and_capture_rows(factory, ball, name, rng=rng) for ball in pokeballs),
+            f"level_capture_{name}", export_format)
+        plot_level_and_capture(pokemon_df, pokeballs, name)
+
+
+@instrumented()
+def level_and_capture_with_capture_rate_rows(factory, ball, name, rng=None):
+    rows = []
+    for level in [1] + list(range(10, 101, 5)):
+        pokemon = factory.create(name, level, StatusEffect.NONE, 0.5)
+        success, catch_prob = attempt_catch(pokemon, ball, rng=rng)
+        rows.append((name, ball, level, catch_prob))
+    return rows
+
+def plot_level_and_capture_with_capture_rate(pokemon_df, pokeballs, name):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for ball in pokeballs:
+        ball_df = pokemon_df[pokemon_df["pokeball"] == ball]
+        ax.plot(ball_df["level"], ball_df["capture_rate"], color=colors.get(ball), label=ball, marker='o')
+
+    ax.set_title(f"Probabilidad de captura vs Nivel para %s " % name)
+    ax.set_xlabel("Nivel")
+    ax.set_ylabel("Probabilidad de captura")
+    ax.grid(True)
+    ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-###    Variating HP    ###
-def analyze_hp_and_capture_with_capture_rate(factory, pokeballs, pokemon_names):
+    output_dir = "graphs"
+    os.makedirs(output_dir, exist_ok=True)
 
-    figures = []  # Lista para almacenar las figuras
+    output_path = os.path.join(output_dir, f"level_capture_{name}_with_capture_rate.png")
+    fig.savefig(output_path, bbox_inches="tight")
+    plt.close(fig)  # Cerrar figura para liberar memoria
 
+@instrumented()
+def analyze_level_and_capture_with_capture_rate(factory, pokeballs, pokemon_names, export_format=None, rng=None):
     for name in pokemon_names:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for ball in pokeballs:
-            prob = []
-            hps = []
-
-            for hp in range(0, 101, 5):
-                pokemon = factory.create(name, 50, StatusEffect.NONE, hp / 100)
-                success, catch_prob = attempt_catch(pokemon, ball)
-                prob.append(catch_prob)
-                hps.append(hp)
-
-            ax.plot(hps, prob, color=colors[ball], label=ball, marker='o')
+        pokemon_df = collect_and_export(
+            LEVEL_CAPTURE_RATE_COLUMNS,
+            (level_and_capture_with_capture_rate_rows(factory, ball, name, rng=rng) for ball in pokeballs),
+            f"level_capture_{name}_with_capture_rate", export_format)
+        plot_level_and_capture_with_capture_rate(pokemon_df, pokeballs, name)
 
-        ax.set_title(f"Probabilidad de captura vs Porcentaje de salud (HP) para %s " % name)
-        ax.set_xlabel("HP %")
-        ax.set_ylabel("Probabilidad de captura")
-        ax.grid(True)
-        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-        figures.append((fig, name))  # Guardar figura en memoria
+###    Variating HP    ###
+@instrumented()
+def hp_and_capture_with_capture_rate_rows(factory, ball, name, rng=None):
+    rows = []
+    for hp in range(0, 101, 5):
+        pokemon = factory.create(name, 50, StatusEffect.NONE, hp / 100)
+        success, catch_prob = attempt_catch(pokemon, ball, rng=rng)
+        rows.append((name, ball, hp, catch_prob))
+    return rows
+
+def plot_hp_and_capture_with_capture_rate(pokemon_df, pokeballs, name):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for ball in pokeballs:
+        ball_df = pokemon_df[pokemon_df["pokeball"] == ball]
+        ax.plot(ball_df["hp"], ball_df["capture_rate"], color=colors.get(ball), label=ball, marker='o')
+
+    ax.set_title(f"Probabilidad de captura vs Porcentaje de salud (HP) para %s " % name)
+    ax.set_xlabel("HP %")
+    ax.set_ylabel("Probabilidad de captura")
+    ax.grid(True)
+    ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-    # Guardar todas las imágenes al final
     output_dir = "graphs"
     os.makedirs(output_dir, exist_ok=True)
 
-    for fig, name in figures:
-        output_path = os.path.join(output_dir, f"hp_capture_{name}_with_capture_rate.png")
-        fig.savefig(output_path, bbox_inches="tight")
-        plt.close(fig)  # Cerrar figura para liberar memoria
-
-
-###    Variating Status    ###
-def analyze_status_and_capture_with_capture_rate(factory, pokeballs, pokemon_names):
-
-    figures = []  # Lista para almacenar las figuras
+    output_path = os.path.join(output_dir, f"hp_capture_{name}_with_capture_rate.png")
+    fig.savefig(output_path, bbox_inches="tight")
+    plt.close(fig)  # Cerrar figura para liberar memoria
 
+@instrumented()
+def analyze_hp_and_capture_with_capture_rate(factory, pokeballs, pokemon_names, export_format=None, rng=None):
     for name in pokemon_names:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for ball in pokeballs:
-            prob = []
-            statuses = []
-
-            for status in StatusEffect:
-                pokemon = factory.create(name, 50, status, 0.5)
-                success, catch_prob = attempt_catch(pokemon, ball)
-                prob.append(catch_prob)
-                statuses.append(status.name)
-
-            ax.plot(statuses, prob, color=colors[ball], label=ball, marker='o')
-        
-        ax.set_title(f"Probabilidad de captura vs Estado para %s " % name)
-        ax.set_xlabel("Estado")
-        ax.set_ylabel("Probabilidad de captura")
-        ax.grid(True)
-        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
+        pokemon_df = collect_and_export(
+            HP_CAPTURE_RATE_COLUMNS,
+            (hp_and_capture_with_capture_rate_rows(factory, ball, name, rng=rng) for ball in pokeballs),
+            f"hp_capture_{name}_with_capture_rate", export_format)
+        plot_hp_and_capture_with_capture_rate(pokemon_df, pokeballs, name)
+
 
-        figures.append((fig, name))  # Guardar figura en memoria
+###    Variating Status    ###
+@instrumented()
+def status_and_capture_with_capture_rate_rows(factory, ball, name, rng=None):
+    rows = []
+    for status in StatusEffect:
+        pokemon = factory.create(name, 50, status, 0.5)
+        success, catch_prob = attempt_catch(pokemon, ball, rng=rng)
+        rows.append((name, ball, status.name, catch_prob))
+    return rows
+
+def plot_status_and_capture_with_capture_rate(pokemon_df, pokeballs, name):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for ball in pokeballs:
+        ball_df = pokemon_df[pokemon_df["pokeball"] == ball]
+        ax.plot(ball_df["status"], ball_df["capture_rate"], color=colors.get(ball), label=ball, marker='o')
     
-    # Guardar todas las imágenes al final
+    ax.set_title(f"Probabilidad de captura vs Estado para %s " % name)
+    ax.set_xlabel("Estado")
+    ax.set_ylabel("Probabilidad de captura")
+    ax.grid(True)
+    ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
+
     output_dir = "graphs"
     os.makedirs(output_dir, exist_ok=True)
 
-    for fig, name in figures:
-        output_path = os.path.join(output_dir, f"health_capture_{name}_with_capture_rate.png")
-        fig.savefig(output_path, bbox_inches="tight")
-        plt.close(fig)  # Cerrar figura para liberar memoria
\ No newline at end of file
+    output_path = os.path.join(output_dir, f"health_capture_{name}_with_capture_rate.png")
+    fig.savefig(output_path, bbox_inches="tight")
+    plt.close(fig)  # Cerrar figura para liberar memoria
+
+@instrumented()
+def analyze_status_and_capture_with_capture_rate(factory, pokeballs, pokemon_names, export_format=None, rng=None):
+    for name in pokemon_names:
+        pokemon_df = collect_and_export(
+            STATUS_CAPTURE_RATE_COLUMNS,
+            (status_and_capture_with_capture_rate_rows(factory, ball, name, rng=rng) for ball in pokeballs),
+            f"health_capture_{name}_with_capture_rate", export_format)
+        plot_status_and_capture_with_capture_rate(pokemon_df, pokeballs, name)
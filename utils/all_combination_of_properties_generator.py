@@ -1,53 +1,284 @@
 import os
-import json
+import math
 import sys
-import subprocess
+import fnmatch
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import numpy as np
+import pandas as pd
 
-from src.catching import attempt_catch
-from src.pokemon import PokemonFactory, StatusEffect
+from src.catching import attempt_catch, attempt_catch_pokemon_batch, raw_capture_rate_batch
+from src.combinations import NPZ_SUFFIX, TXT_SUFFIX, write_combinations
+from src.dataset import Chunk, CombinationDataset, chunk_key
+from src.pokeball import get_pokeball
+from src.pokemon import PokemonFactory, StatusEffect, get_species_registry
 #we test two pokemons passed as parameters under different conditions
 
-if __name__ == "__main__":
-     # Check if we have the correct number of arguments
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <pokemon> <second_pokemon>")
-        print("Example: python3 run_pokemon_script.py snorlax caterpie")
-        sys.exit(1)
-    
-    first_pokemon = sys.argv[1]
-    second_pokemon = sys.argv[2]
-    print(f"First pokemon: {first_pokemon}, Second pokemon: {second_pokemon}")
-    
-    pokeball_types = ["pokeball", "ultraball", "fastball", "heavyball"]
-    status_types = [StatusEffect.NONE, StatusEffect.BURN, StatusEffect.FREEZE, StatusEffect.POISON, StatusEffect.PARALYSIS, StatusEffect.SLEEP]
-    status_names = {StatusEffect.NONE: "None", StatusEffect.BURN: "Burn", StatusEffect.FREEZE: "Freeze", StatusEffect.POISON: "Poison", StatusEffect.PARALYSIS: "Paralysis", StatusEffect.SLEEP: "Sleep"}
-    
+pokeball_types = ["pokeball", "ultraball", "fastball", "heavyball"]
+status_types = [StatusEffect.NONE, StatusEffect.BURN, StatusEffect.FREEZE, StatusEffect.POISON, StatusEffect.PARALYSIS, StatusEffect.SLEEP]
+status_names = {StatusEffect.NONE: "None", StatusEffect.BURN: "Burn", StatusEffect.FREEZE: "Freeze", StatusEffect.POISON: "Poison", StatusEffect.PARALYSIS: "Paralysis", StatusEffect.SLEEP: "Sleep"}
+
+# the output of the test is a file with the following format:
+# Pokemon: string with the name of the pokemon
+# Level: integer value between 1 and 100
+# Status: string with one of the following states: ["poison", "burn", "paralysis", "sleep", "freeze", "none"]
+# HP: value between 1 and 100, integer unless a finer --hp step is used
+RECORD = ("Pokemon: {}\nPokeball: {}\nLevel: {}\nStatus: {}\nHP: {:g}\nCaptureRate: {}\n"
+          "------------------------------------------------------\n")
+
+
+def grid_range(spec, type=float):
+    # "start:stop:step" with an inclusive stop, the step defaults to 1. Raises
+    # ValueError for a spec that is malformed or has no values
+    parts = spec.split(":")
+    try:
+        if len(parts) not in (2, 3):
+            raise ValueError
+        start, stop, *step = (type(value) for value in parts)
+    except ValueError:
+        raise ValueError(f"{spec} is not START:STOP or START:STOP:STEP")
+    step = step[0] if step else type(1)
+    if not all(math.isfinite(value) for value in (start, stop, step)):
+        raise ValueError(f"{spec} has to be made of finite numbers")
+    if step <= 0:
+        raise ValueError(f"The step of {spec} has to be greater than 0")
+    if stop < start:
+        raise ValueError(f"{spec} is empty, its stop is lower than its start")
+    values = np.arange(start, stop + step / 2, step)
+    return values.astype(int) if type is int else np.round(values, 10)
+
+
+def generate_loop(factory, pokemon, levels, hps, balls=pokeball_types, statuses=status_types):
+    # Yields one (pokeball, level, status name, hp, capture_rate) per combination
+    for ball in balls:
+        for status in statuses:
+            for level in levels:
+                for health in hps:
+                    # we create the pokemon
+                    pokemonCreated = factory.create(pokemon, int(level), status, health / 100)
+                    # now we test catching it
+                    attempt_success, capture_rate = attempt_catch(pokemonCreated, ball)
+                    yield ball, level, status_names[status], health, capture_rate
+
+
+def generate_vectorized(factory, pokemon, levels, hps, balls=pokeball_types, statuses=status_types):
+    # Same combinations and order as generate_loop, computed as one
+    # (pokeball, status, level, hp) grid with NumPy broadcasting
+    pokemons = factory.create_batch(
+        pokemon,
+        levels[None, None, :, None],
+        np.array(statuses, dtype=object)[None, :, None, None],
+        hps[None, None, None, :] / 100,
+    )
+    attempt_success, capture_rate = attempt_catch_pokemon_batch(
+        pokemons, np.array(balls)[:, None, None, None])
+
+    # The name columns are returned as categoricals so they are not re-encoded
+    shape = capture_rate.shape
+    return (
+        pd.Categorical.from_codes(
+            np.broadcast_to(np.arange(len(balls))[:, None, None, None], shape).ravel(), balls),
+        np.broadcast_to(levels[None, None, :, None], shape).ravel(),
+        pd.Categorical.from_codes(
+            np.broadcast_to(np.arange(len(statuses))[None, :, None, None], shape).ravel(),
+            [status_names[status] for status in statuses]),
+        np.broadcast_to(hps[None, None, None, :], shape).ravel(),
+        capture_rate.ravel(),
+    )
+
+
+def text_capture_rates(factory, pokemon, balls, levels, statuses, hps, capture_rates):
+    # attempt_catch returns the integer 1 for the rates it caps and the float
+    # 1.0 for those that are exactly 1, which the text files have always kept
+    # apart. The columns only hold floats, so the rows at 1 are told apart by
+    # their raw capture rate
+    capture_rates = np.asarray(capture_rates, dtype=float)
+    values = capture_rates.tolist()
+    at_one = np.flatnonzero(capture_rates == 1)
+    if len(at_one):
+        status_effects = {status_names[status]: status for status in status_types}
+        pokemons = factory.create_batch(
+            pokemon,
+            np.asarray(levels)[at_one],
+            np.array([status_effects[status] for status in np.asarray(statuses)[at_one]], dtype=object),
+            np.asarray(hps, dtype=float)[at_one] / 100,
+        )
+        raw_capture_rates = raw_capture_rate_batch(pokemons, np.asarray(balls, dtype=str)[at_one])
+        for index in at_one[raw_capture_rates > 1]:
+            values[index] = 1
+    return values
+
+
+def generate_checkpointed(factory, dataset, pokemon, levels, hps, chunk_levels=10, vectorized=False):
+    """Generates the grid of a species one chunk at a time into a CombinationDataset
+
+    Chunks hold one (pokeball, status) and at most chunk_levels levels. Those
+    already in the dataset, from a previous or interrupted run with the same
+    inputs, are read back instead of computed.
+
+    Returns
+    -------
+    columns::Tuple
+        pokeball, level, status, hp and capture_rate columns, in the order of generate_loop
+    computed::int
+        Number of chunks that had to be computed
+    """
+    species = get_species_registry("pokemon.json").get(pokemon)
+    level_chunks = [levels[start:start + chunk_levels] for start in range(0, len(levels), chunk_levels)]
+
+    chunks, columns, computed = [], [], 0
+    for ball in pokeball_types:
+        for status in status_types:
+            for chunk_grid in level_chunks:
+                chunk = Chunk(pokemon, ball, status_names[status], int(chunk_grid[0]), int(chunk_grid[-1]),
+                              len(chunk_grid) * len(hps), chunk_key(species, get_pokeball(ball), status, chunk_grid, hps))
+                if not dataset.has_chunk(chunk):
+                    if vectorized:
+                        _, level, _, hp, capture_rate = generate_vectorized(
+                            factory, pokemon, chunk_grid, hps, [ball], [status])
+                    else:
+                        _, level, _, hp, capture_rate = zip(*generate_loop(
+                            factory, pokemon, chunk_grid, hps, [ball], [status]))
+                    dataset.write_chunk(chunk, level, hp, capture_rate)
+                    computed += 1
+                chunks.append(chunk)
+                columns.append(dataset.read_chunk(chunk))
+    dataset.write_species(pokemon, chunks)
+
+    level, hp, capture_rate = (np.concatenate(column) for column in zip(*columns))
+    rows = [len(chunk_columns[0]) for chunk_columns in columns]
+    ball_labels = pokeball_types
+    status_labels = [status_names[status] for status in status_types]
+    balls = pd.Categorical.from_codes(
+        np.repeat([ball_labels.index(chunk.pokeball) for chunk in chunks], rows), ball_labels)
+    statuses = pd.Categorical.from_codes(
+        np.repeat([status_labels.index(chunk.status) for chunk in chunks], rows), status_labels)
+    return (balls, level, statuses, hp, capture_rate), computed
+
+
+def generate_species(pokemon, levels, hps, file_format="txt", vectorized=False, checkpoint=None, chunk_levels=10,
+                     write_file=True):
+    # Generates and writes the grid of one species, run in its own worker process
+    # when several species are generated. Returns the line reported for it
     factory = PokemonFactory("pokemon.json")
+    report = f"{pokemon}: {len(levels) * len(hps) * len(pokeball_types) * len(status_types)} combinations"
+
+    if checkpoint is not None:
+        dataset = CombinationDataset(checkpoint)
+        (balls, grid_levels, statuses, healths, capture_rates), computed = generate_checkpointed(
+            factory, dataset, pokemon, levels, hps, chunk_levels, vectorized)
+        total = len(dataset.species_chunks(pokemon))
+        report = f"{pokemon}: {computed} of {total} chunks computed, {total - computed} reused"
+    elif vectorized:
+        balls, grid_levels, statuses, healths, capture_rates = generate_vectorized(factory, pokemon, levels, hps)
+    else:
+        balls, grid_levels, statuses, healths, capture_rates = zip(*generate_loop(factory, pokemon, levels, hps))
+
+    if not write_file:
+        return report
+    if file_format == "npz":
+        write_combinations(f'{pokemon}{NPZ_SUFFIX}', pokemon, balls, grid_levels,
+                           statuses, healths, capture_rates)
+        return report
+
+    capture_rates = text_capture_rates(factory, pokemon, balls, grid_levels, statuses, healths, capture_rates)
+    with open(f'{pokemon}{TXT_SUFFIX}', 'w') as file:
+        file.writelines(
+            RECORD.format(pokemon, ball, level, status, health, capture_rate)
+            for ball, level, status, health, capture_rate
+            in zip(balls, grid_levels, statuses, healths, capture_rates)
+        )
+    return report
+
+
+def select_species(patterns, src_file="pokemon.json"):
+    """Species to generate, in order and without repetitions
+
+    Every pattern is a species name, a glob matched against the names in
+    src_file such as "char*", or "all" for every species of the file.
+    """
+    names = get_species_registry(src_file).names()
+    selected, seen = [], set()
+    for pattern in patterns:
+        if pattern == "all":
+            matches = names
+        elif any(character in pattern for character in "*?["):
+            matches = [name for name in names if fnmatch.fnmatchcase(name.lower(), pattern.lower())]
+            if not matches:
+                raise ValueError(f"No pokemon matches {pattern}")
+        else:
+            get_species_registry(src_file).get(pattern)  # Raises ValueError if it does not exist
+            matches = [pattern]
+        for name in matches:
+            if name.lower() not in seen:
+                seen.add(name.lower())
+                selected.append(name)
+    return selected
+
 
-    # the output of the test is a file with the following format:
-    # Pokemon: string with the name of the pokemon
-    # Level: integer value between 1 and 100
-    # Status: string with one of the following states: ["poison", "burn", "paralysis", "sleep", "freeze", "none"]
-    # HP: integer value between 1 and 100
-
-    for pokemon in [first_pokemon, second_pokemon]:
-        with open(f'{pokemon}_conditions_combination.txt', 'w') as file:
-            for ball in pokeball_types:
-                for status in status_types:
-                    for level in range (1, 101):
-                        for health in range(1, 101):
-                            lines = []
-                            lines.append(f"Pokemon: {pokemon}\n")
-                            lines.append(f"Pokeball: {ball}\n")
-                            lines.append(f"Level: {level}\n")
-                            lines.append(f"Status: {status_names[status]}\n")
-                            lines.append(f"HP: {health}\n")
-                            # we create the pokemon
-                            pokemonCreated = factory.create(pokemon, level, status, health / 100)
-                            # now we test catching it  
-                            attempt_success, capture_rate = attempt_catch(pokemonCreated, ball)
-                            lines.append(f"CaptureRate: {capture_rate}\n")
-                            lines.append("------------------------------------------------------\n")
-                            file.writelines(lines)
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        epilog="Example: python3 utils/all_combination_of_properties_generator.py snorlax caterpie, "
+               "or python3 utils/all_combination_of_properties_generator.py all --vectorized --checkpoint dex "
+               "--only-dataset")
+    parser.add_argument("pokemon", nargs="+",
+                        help="species names, glob patterns such as 'char*', or all for every species in pokemon.json")
+    parser.add_argument("--format", choices=["txt", "npz"], default="txt",
+                        help="txt writes the seven line records, npz writes typed columns (see src/combinations.py)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="compute the whole grid at once with NumPy instead of one throw at a time")
+    parser.add_argument("--levels", default="1:100:1", metavar="START:STOP:STEP",
+                        help="levels of the grid, stop included (default: 1:100:1)")
+    parser.add_argument("--hp", default="1:100:1", metavar="START:STOP:STEP",
+                        help="hp percentages of the grid, stop included, e.g. 0.1:100:0.1 (default: 1:100:1)")
+    parser.add_argument("--checkpoint", default=None, metavar="DIR",
+                        help="keep every (pokeball, status, level range) chunk in DIR and only compute the missing "
+                             "or stale ones, so an interrupted run can be resumed (see src/dataset.py)")
+    parser.add_argument("--chunk-levels", type=int, default=10,
+                        help="levels per chunk with --checkpoint (default: 10)")
+    parser.add_argument("--only-dataset", action="store_true",
+                        help="with --checkpoint, only write the dataset and not a combinations file per species")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes, each generating one species at a time (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if args.only_dataset and args.checkpoint is None:
+        parser.error("--only-dataset needs --checkpoint")
+    try:
+        species = select_species(args.pokemon)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Pokemon: {', '.join(species)}")
+
+    try:
+        levels = grid_range(args.levels, int)
+        hps = grid_range(args.hp)
+    except ValueError as error:
+        parser.error(str(error))
+    if levels.min() < 1 or levels.max() > 100 or hps.min() < 0 or hps.max() > 100:
+        parser.error("levels have to be between 1 and 100 and hp between 0 and 100")
+
+    dataset = CombinationDataset(args.checkpoint) if args.checkpoint else None
+    generate = partial(generate_species, levels=levels, hps=hps, file_format=args.format,
+                       vectorized=args.vectorized, checkpoint=args.checkpoint, chunk_levels=args.chunk_levels,
+                       write_file=not args.only_dataset)
+
+    # Species are independent, every worker takes the next one as soon as it is done
+    workers = min(args.workers or os.cpu_count(), len(species))
+    if workers == 1:
+        for report in map(generate, species):
+            print(report)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for report in executor.map(generate, species):
+                print(report)
+
+    if dataset is not None:
+        dataset.write_manifest()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.catching import attempt_catch, attempt_catch_pokemon_batch, capture_rate_cache
+from src.combinations import aggregate_combinations, load_combinations, write_combinations
+from src.estimation import sample_capture
+from src.pokemon import PokemonFactory, StatusEffect
+from src.rng import CatchRNG
+from src.utils import getProbabilityOfCapture, health_and_capture_rows, level_and_capture_rows
+from utils.all_combination_of_properties_generator import RECORD, generate_loop, generate_vectorized, \
+    grid_range
+
+# Benchmarks of the catch pipeline. Every benchmark does its setup and returns
+# the function that is timed, which is run --repeat times; the median time is
+# compared against the stored baseline and a table with the ratios is printed.
+#
+#   python utils/benchmark.py --save        # store the current times as the baseline
+#   python utils/benchmark.py               # compare against it
+#   python utils/benchmark.py throw batch   # only the benchmarks whose name contains these words
+
+BASELINE = os.path.join("benchmarks", "baseline.json")
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("throw.single")
+def single_throws(factory, workdir):
+    pokemon = factory.create("snorlax", 50, StatusEffect.NONE, 0.5)
+    rng = CatchRNG(0)
+
+    def run():
+        for _ in range(10_000):
+            attempt_catch(pokemon, "heavyball", rng=rng)
+    return run
+
+
+@benchmark("throw.single_uncached")
+def single_uncached_throws(factory, workdir):
+    pokemon = factory.create("snorlax", 50, StatusEffect.NONE, 0.5)
+    rng = CatchRNG(0)
+
+    def run():
+        for _ in range(10_000):
+            capture_rate_cache.clear()
+            attempt_catch(pokemon, "heavyball", rng=rng)
+    return run
+
+
+@benchmark("throw.single_noise")
+def single_noisy_throws(factory, workdir):
+    pokemon = factory.create("snorlax", 50, StatusEffect.NONE, 0.5)
+    rng = CatchRNG(0)
+
+    def run():
+        for _ in range(10_000):
+            attempt_catch(pokemon, "heavyball", 0.1, rng=rng)
+    return run
+
+
+@benchmark("throw.batch")
+def batch_throws(factory, workdir):
+    pokemons = factory.create_batch("snorlax", np.arange(1, 101)[:, None], StatusEffect.NONE,
+                                    np.linspace(0, 1, 1000)[None, :])
+    rng = CatchRNG(0)
+    return lambda: attempt_catch_pokemon_batch(pokemons, "heavyball", 0.1, rng)
+
+
+@benchmark("factory.create")
+def factory_create(factory, workdir):
+    def run():
+        for level in range(1, 101):
+            for hp in range(100):
+                factory.create("snorlax", level, StatusEffect.NONE, hp / 100)
+    return run
+
+
+@benchmark("factory.create_batch")
+def factory_create_batch(factory, workdir):
+    levels, hps = np.arange(1, 101)[:, None], np.linspace(0, 1, 1000)[None, :]
+    return lambda: factory.create_batch("snorlax", levels, StatusEffect.NONE, hps)
+
+
+@benchmark("analysis.probability_of_capture")
+def probability_of_capture(factory, workdir):
+    pokemon = factory.create("caterpie", 100, StatusEffect.NONE, 1)
+    rng = CatchRNG(0)
+    return lambda: getProbabilityOfCapture(pokemon, "ultraball", 10_000, rng=rng)
+
+
+@benchmark("analysis.sample_capture")
+def sampled_capture(factory, workdir):
+    pokemon = factory.create("caterpie", 100, StatusEffect.NONE, 0)
+    rng = CatchRNG(0)
+    return lambda: sample_capture(pokemon, "ultraball", 1000, 100, 0.1, rng)
+
+
+@benchmark("analysis.health_rows")
+def health_rows(factory, workdir):
+    rng = CatchRNG(0)
+    return lambda: health_and_capture_rows(factory, "ultraball", "caterpie", rng=rng)
+
+
+@benchmark("analysis.level_rows")
+def level_rows(factory, workdir):
+    rng = CatchRNG(0)
+    return lambda: level_and_capture_rows(factory, "ultraball", "caterpie", rng=rng)
+
+
+@benchmark("generator.loop")
+def generator_loop(factory, workdir):
+    levels, hps = grid_range("1:100:1", int), grid_range("0:100:10")
+    return lambda: list(generate_loop(factory, "snorlax", levels, hps))
+
+
+@benchmark("generator.vectorized")
+def generator_vectorized(factory, workdir):
+    levels, hps = grid_range("1:100:1", int), grid_range("1:100:1")
+    return lambda: generate_vectorized(factory, "snorlax", levels, hps)
+
+
+def _write_grid(factory, workdir):
+    levels, hps = grid_range("1:100:1", int), grid_range("1:100:1")
+    columns = generate_vectorized(factory, "snorlax", levels, hps)
+    npz_path = os.path.join(workdir, "snorlax_conditions_combination.npz")
+    txt_path = os.path.join(workdir, "snorlax_conditions_combination.txt")
+    if not os.path.exists(npz_path):
+        write_combinations(npz_path, "snorlax", *columns)
+        with open(txt_path, "w") as file:
+            file.writelines(RECORD.format("snorlax", *record) for record in zip(*columns))
+    return columns, npz_path, txt_path
+
+
+@benchmark("files.write_npz")
+def write_npz(factory, workdir):
+    columns, _, _ = _write_grid(factory, workdir)
+    path = os.path.join(workdir, "write_benchmark.npz")
+    return lambda: write_combinations(path, "snorlax", *columns)
+
+
+@benchmark("files.load_npz")
+def load_npz(factory, workdir):
+    _, npz_path, _ = _write_grid(factory, workdir)
+    return lambda: load_combinations(npz_path)
+
+
+@benchmark("files.parse_txt")
+def parse_txt(factory, workdir):
+    from visualize_best_combination_of_properties_per_ball import parse_pokemon_file
+    _, _, txt_path = _write_grid(factory, workdir)
+    return lambda: parse_pokemon_file(txt_path)
+
+
+@benchmark("files.aggregate_npz")
+def aggregate_npz(factory, workdir):
+    _, npz_path, _ = _write_grid(factory, workdir)
+    return lambda: aggregate_combinations(npz_path, [(50, 50), (1, 100)])
+
+
+def run_benchmarks(names, repeat):
+    factory = PokemonFactory("pokemon.json")
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            run = BENCHMARKS[name](factory, workdir)
+            run()  # Warm up caches and lazy imports
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start)
+            results[name] = {"median": statistics.median(times), "min": min(times)}
+            print(f"{name}: {results[name]['median'] * 1000:.2f}ms", file=sys.stderr)
+    return results
+
+
+def machine():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def print_comparison(results, baseline, threshold):
+    # Returns the names of the benchmarks slower than threshold times their baseline
+    regressions = []
+    print(f"{'benchmark':<34}{'baseline (ms)':>15}{'current (ms)':>15}{'ratio':>9}  status")
+    for name, result in results.items():
+        current = result["median"] * 1000
+        if name not in baseline:
+            print(f"{name:<34}{'-':>15}{current:>15.2f}{'-':>9}  new")
+            continue
+        previous = baseline[name]["median"] * 1000
+        ratio = current / previous
+        status = "ok"
+        if ratio > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            status = "faster"
+        print(f"{name:<34}{previous:>15.2f}{current:>15.2f}{ratio:>9.2f}  {status}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        epilog="Example: python3 utils/benchmark.py --save, then python3 utils/benchmark.py after a change")
+    parser.add_argument("filters", nargs="*", help="only run the benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of every benchmark (default: 5)")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE, help=f"baseline file (default: {BASELINE})")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="ratio to the baseline reported as a regression (default: 1.2)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if not args.filters or any(f in name for f in args.filters)]
+    results = run_benchmarks(names, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            stored = json.load(file)
+        baseline = stored["results"]
+        if stored["machine"] != machine():
+            print(f"Warning: the baseline was taken on {stored['machine']}", file=sys.stderr)
+
+    regressions = print_comparison(results, baseline, args.threshold)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump({"machine": machine(), "results": {**baseline, **results}}, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.all_combination_of_properties_generator import main as generate_main
+
+# Checks that the text files of the generator are still byte for byte the ones
+# the original generator wrote, in every mode. generator_baseline.json holds
+# the sha256 of the original file of every species of pokemon.json, next to
+# the hash of the species record it was generated from; species whose record
+# changed since are skipped.
+#
+#   python utils/check_generator.py                 # every species, exits 1 on a mismatch
+#   python utils/check_generator.py caterpie onix
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generator_baseline.json")
+MODES = {
+    "loop": [],
+    "vectorized": ["--vectorized"],
+    "checkpoint": ["--vectorized", "--checkpoint", "checkpoint"],
+}
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(epilog="Example: python3 utils/check_generator.py caterpie")
+    parser.add_argument("pokemon", nargs="*", help="species to check (default: every species of the baseline)")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args(argv)
+
+    with open(BASELINE, "r") as file:
+        baseline = json.load(file)
+    with open("pokemon.json", "r") as file:
+        pokemon_db = json.load(file)
+
+    species = []
+    for pokemon in args.pokemon or list(baseline):
+        if pokemon not in baseline or pokemon not in pokemon_db:
+            parser.error(f"No baseline for {pokemon}")
+        record = hashlib.sha256(json.dumps(pokemon_db[pokemon], sort_keys=True).encode()).hexdigest()
+        if record != baseline[pokemon]["species"]:
+            print(f"{pokemon}: skipped, its record in pokemon.json changed")
+            continue
+        species.append(pokemon)
+
+    failures = 0
+    source = os.path.abspath("pokemon.json")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.symlink(source, os.path.join(workdir, "pokemon.json"))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for mode in args.modes:
+                generate_main(species + MODES[mode] + ["--workers", "1"])
+                for pokemon in species:
+                    matches = file_digest(f"{pokemon}_conditions_combination.txt") == baseline[pokemon]["txt"]
+                    failures += not matches
+                    print(f"{pokemon} ({mode}): {'ok' if matches else 'DIFFERENT from the baseline'}")
+        finally:
+            os.chdir(cwd)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+# Local load generator for the capture rate service (python main.py serve).
+# Every client keeps one connection open and sends random /rate queries one
+# after the other for the given duration, then throughput and latency
+# percentiles are printed, along with the /stats of the server.
+
+STATUSES = ["none", "poison", "burn", "paralysis", "sleep", "freeze"]
+
+
+async def open_connection(host, port, unix_path):
+    if unix_path:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(host, port)
+
+
+async def get(reader, writer, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, unix_path, pokemons, pokeballs, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await open_connection(host, port, unix_path)
+    try:
+        while time.perf_counter() < deadline:
+            target = (f"/rate?pokemon={rng.choice(pokemons)}&pokeball={rng.choice(pokeballs)}"
+                      f"&level={rng.randint(1, 100)}&status={rng.choice(STATUSES)}&hp={rng.random():.3f}")
+            start = time.perf_counter()
+            status, _ = await get(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    with open(args.pokemon_file, "r") as file:
+        pokemons = list(json.load(file))
+    with open(args.pokeball_file, "r") as file:
+        pokeballs = list(json.load(file))
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        client(args.host, args.port, args.unix, pokemons, pokeballs, deadline, latencies, errors, seed)
+        for seed in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"{len(latencies)} requests in {elapsed:.2f}s with {args.clients} clients, "
+          f"{len(latencies) / elapsed:.0f} req/s, {len(errors)} errors")
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+        print(f"Client latency: p50 {p50:.2f}ms, p90 {p90:.2f}ms, p99 {p99:.2f}ms, max {latencies_ms.max():.2f}ms")
+
+    reader, writer = await open_connection(args.host, args.port, args.unix)
+    _, stats = await get(reader, writer, "/stats")
+    writer.close()
+    print(f"Server stats: {stats}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        epilog="Example: python3 utils/load_generator.py --clients 64 --duration 10")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", default=None, metavar="PATH", help="connect to a UNIX socket instead")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections (default: 32)")
+    parser.add_argument("--duration", type=float, default=5, help="seconds of load (default: 5)")
+    parser.add_argument("--pokemon-file", default="pokemon.json")
+    parser.add_argument("--pokeball-file", default="pokeball.json")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
 from src.pokemon import StatusEffect, PokemonFactory
 from src.catching import attempt_catch
+from src.render import FigureJob, render_figures
 import json
-import matplotlib
 import os
 import sys
 
-matplotlib.use('Qt5Agg')
 import matplotlib.pyplot as plt
 
 colors = {
@@ -19,48 +18,64 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-def analyze_effectiveness(factory, pokemon_name, status_list, hp_min, hp_max, pokeballs):
+def effectiveness_curve(factory, pokemon_name, status, hp_values, ball):
+    levels = [1] + list(range(10, 101, 5))
+    mean_probs = []
+    std_devs = []
 
-    hp_values = np.linspace(hp_min, hp_max, 5)
+    for level in levels:
+        catch_probs = []
 
-    for status in status_list:
-        fig, ax = plt.subplots(figsize=(10, 6))
+        for hp in hp_values:
+            pokemon = factory.create(pokemon_name, level, status, hp)  
+            success, catch_prob = attempt_catch(pokemon, ball)
+            catch_probs.append(catch_prob)
 
-        for ball in pokeballs:
-            levels = [1] + list(range(10, 101, 5))
-            mean_probs = []
-            std_devs = []
+        mean_prob = np.mean(catch_probs) 
+        std_dev = np.std(catch_probs)  
 
-            for level in levels:
-                catch_probs = []
+        mean_probs.append(mean_prob)
+        std_devs.append(std_dev)
 
-                for hp in hp_values:
-                    pokemon = factory.create(pokemon_name, level, status, hp)  
-                    success, catch_prob = attempt_catch(pokemon, ball)
-                    catch_probs.append(catch_prob)
+    return levels, mean_probs, std_devs
 
-                mean_prob = np.mean(catch_probs) 
-                std_dev = np.std(catch_probs)  
+def plot_effectiveness(curves, pokemon_name, status_name):
+    # curves maps each ball to the (levels, mean_probs, std_devs) of effectiveness_curve
+    fig, ax = plt.subplots(figsize=(10, 6))
 
-                mean_probs.append(mean_prob)
-                std_devs.append(std_dev)
+    for ball, (levels, mean_probs, std_devs) in curves.items():
+        ax.errorbar(levels, mean_probs, yerr=np.array(std_devs), fmt='-o', label=ball, capsize=5)
 
-            std_dev_promedio = np.mean(std_devs)
-            print(f"\n🔹 Desvío estándar promedio para {ball} ({status.name}): {std_dev_promedio}\n")
+    ax.set_title(f"Probabilidad de captura de {pokemon_name} ({status_name})")
+    ax.set_xlabel("Nivel")
+    ax.set_ylabel("Probabilidad de captura")
+    ax.grid(True)
+    ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-            ax.errorbar(levels, mean_probs, yerr=np.array(std_devs), fmt='-o', label=ball, capsize=5)
+    output_dir = "graphs"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"effectiveness_{pokemon_name}_{status_name}.png")
+    fig.savefig(output_path, bbox_inches="tight")
+    plt.close(fig)
+
+def analyze_effectiveness(factory, pokemon_name, status_list, hp_min, hp_max, pokeballs, workers=None):
+
+    hp_values = np.linspace(hp_min, hp_max, 5)
+
+    # The curves are computed here and the figures rendered afterwards, one per status, in parallel
+    jobs = []
+    for status in status_list:
+        curves = {}
+
+        for ball in pokeballs:
+            curves[ball] = effectiveness_curve(factory, pokemon_name, status, hp_values, ball)
+
+            std_dev_promedio = np.mean(curves[ball][2])
+            print(f"\n🔹 Desvío estándar promedio para {ball} ({status.name}): {std_dev_promedio}\n")
 
-        ax.set_title(f"Probabilidad de captura de {pokemon_name} ({status.name})")
-        ax.set_xlabel("Nivel")
-        ax.set_ylabel("Probabilidad de captura")
-        ax.grid(True)
-        ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
+        jobs.append(FigureJob(plot_effectiveness, (curves, pokemon_name, status.name)))
 
-        output_dir = "graphs"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"effectiveness_{pokemon_name}_{status.name}.png")
-        fig.savefig(output_path, bbox_inches="tight")
-        plt.close(fig)
+    render_figures(jobs, workers)
   
 
 
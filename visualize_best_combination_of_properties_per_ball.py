@@ -1,81 +1,58 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import argparse
 import os
-import sys
 import seaborn as sns
-from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.patches import Patch
 import matplotlib.colors as mcolors
 
+from src.dataset import CombinationDataset
+from src.render import FigureJob, render_figures
+from src.combinations import NPZ_SUFFIX, TXT_SUFFIX, CaptureRateMoments, LevelRangeMoments, \
+    aggregate_combinations, iter_combinations, load_combinations
 
-def parse_pokemon_file(file_path):
-    data = []
-    with open(file_path, 'r') as file:
-        entry = {}
-        for line in file:
-            line = line.strip()
-            
-            if line.startswith("Pokemon:"):
-                entry["Pokemon"] = line.split("Pokemon:")[1].strip()
-            elif line.startswith("Pokeball:"):
-                entry["Pokeball"] = line.split("Pokeball:")[1].strip()
-            elif line.startswith("Level:"):
-                entry["Level"] = int(line.split("Level:")[1].strip())
-            elif line.startswith("Status:"):
-                entry["Status"] = line.split("Status:")[1].strip().lower()
-            elif line.startswith("HP:"):
-                entry["HP"] = float(line.split("HP:")[1].strip()) / 100  # Convert to proportion
-            elif line.startswith("CaptureRate:"):
-                entry["CaptureRate"] = float(line.split("CaptureRate:")[1].strip())
-            elif line.startswith("---------"):
-                if entry:  # Only append if entry is not empty
-                    data.append(entry.copy())
-                    entry = {}
-    
-    # Adds the last entry if file doesn't end with dashes
-    if entry:
-        data.append(entry)
-    
-    return pd.DataFrame(data)
 
-def create_capture_rate_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
+def parse_pokemon_file(file_path):
+    return pd.concat(iter_combinations(file_path), ignore_index=True)
+
+def pokemon_data_path(pokemon_name):
+    # Prefer the columnar file written with --format npz unless the text file is newer
+    npz_path = f"{pokemon_name}{NPZ_SUFFIX}"
+    txt_path = f"{pokemon_name}{TXT_SUFFIX}"
+    if os.path.exists(npz_path) and (not os.path.exists(txt_path) or
+                                     os.path.getmtime(npz_path) >= os.path.getmtime(txt_path)):
+        return npz_path
+    return txt_path
+
+def load_pokemon_data(pokemon_name):
+    file_path = pokemon_data_path(pokemon_name)
+    if file_path.endswith(".npz"):
+        return load_combinations(file_path)
+    return parse_pokemon_file(file_path)
+
+def create_capture_rate_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, fixed_level=50):
+    statistics1 = capture_rate_statistics(CaptureRateMoments(fixed_level, fixed_level).update(df1).result())
+    statistics2 = capture_rate_statistics(CaptureRateMoments(fixed_level, fixed_level).update(df2).result())
+    create_capture_rate_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir, fixed_level)
+
+# Takes the capture_rate_statistics of each pokemon at fixed_level instead of every row
+def create_capture_rate_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir, fixed_level=50):
     os.makedirs(output_dir, exist_ok=True)
     
     pokeball_types = ["pokeball", "ultraball", "fastball", "heavyball"]
     status_names = ["none", "burn", "freeze", "poison", "paralysis", "sleep"]
     
-    fixed_level = 50
-    
-    def create_heatmap_for_pokemon(df, pokemon_name, pokeball, cmap):
-        filtered_df = df[(df['Pokeball'] == pokeball) & (df['Level'] == fixed_level)]
+    def create_heatmap_for_pokemon(statistics, pokemon_name, pokeball, cmap):
+        pokeball_data = statistics[statistics['Pokeball'] == pokeball]
         
-        if filtered_df.empty:
+        if pokeball_data.empty:
             print(f"No data available for {pokemon_name} with {pokeball} at level {fixed_level}")
             return
         
-        hp_values = sorted(filtered_df['HP'].unique())
-        
-        # If there are too many HP values, bin them for better visualization
-        if len(hp_values) > 20:
-            hp_bins = np.linspace(min(hp_values), max(hp_values), 20)
-            hp_labels = [f"{hp_bins[i]:.2f}-{hp_bins[i+1]:.2f}" for i in range(len(hp_bins)-1)]
-            filtered_df['HP_binned'] = pd.cut(filtered_df['HP'], bins=hp_bins, labels=hp_labels)
-            hp_column = 'HP_binned'
-        else:
-            # If there aren't too many HP values, use them directly
-            hp_column = 'HP'
-        
-        # Create a pivot table: status vs HP with capture rate as values
-        pivot = filtered_df.pivot_table(
-            index='Status', 
-            columns=hp_column, 
-            values='CaptureRate',
-            aggfunc='mean'
-        )
-        
-        # Reorder the index to match the status_names order
-        pivot = pivot.reindex(status_names)
+        # Status vs HP group with the mean capture rate as values
+        pivot = pokeball_data.pivot(index='Status', columns='HP_Group', values='Mean')
+        pivot = pivot.reindex(index=status_names, columns=sort_hp_groups(pokeball_data['HP_Group']))
         
         # Create the heatmap
         plt.figure(figsize=(14, 8))
@@ -100,8 +77,8 @@ def create_capture_rate_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
     
     # Generate heatmaps for all pokeball types for both Pokemon
     for pokeball in pokeball_types:
-        create_heatmap_for_pokemon(df1, pokemon1, pokeball, "YlGnBu")
-        create_heatmap_for_pokemon(df2, pokemon2, pokeball, "YlOrBr")
+        create_heatmap_for_pokemon(statistics1, pokemon1, pokeball, "YlGnBu")
+        create_heatmap_for_pokemon(statistics2, pokemon2, pokeball, "YlOrBr")
 
 def create_bar_plot_for_pokemon_prices(output_directory):
     prices = {
@@ -137,17 +114,7 @@ def create_bar_plot_for_pokemon_prices(output_directory):
     plt.close()
 
 def group_hp_by_capture_rate(df, num_groups=10):
-    pokeball_prices = {
-        "pokeball": 200,
-        "ultraball": 1200,
-        "fastball": 500,
-        "heavyball": 500
-    }
-    
-    df_copy = df.copy()
-    df_copy['Efficiency'] = df_copy.apply(lambda row: row['CaptureRate'] / pokeball_prices[row['Pokeball']], axis=1)
-    
-    hp_values = sorted(df_copy['HP'].unique())
+    hp_values = sorted(df['HP'].unique())
     
     # If there are few HP values, return them as is
     if len(hp_values) <= num_groups:
@@ -166,8 +133,78 @@ def group_hp_by_capture_rate(df, num_groups=10):
     
     return hp_groups
 
-def create_efficiency_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
-    def create_efficiency_heatmap(df, pokemon_name, output_dir, fixed_level=50, num_hp_groups=10):
+def best_ball_table(df, prices, value="CaptureRate"):
+    """Most cost-effective pokeball of every (Status, HP_Group)
+
+    The efficiency of a ball is the mean of `value` over its rows divided by
+    its price. All the groups are solved at once over a (group, ball) array,
+    ties go to the ball that comes first in prices.
+
+    Parameters
+    ----------
+    df::[pd.DataFrame]
+        Rows with Pokeball, Status, HP_Group and `value` columns, balls
+        missing from prices are ignored
+    prices::[Dict[str, float]]
+        Price of every pokeball
+    value::[str]
+        Column with the capture rate, Mean for the output of std_dev_by_hp_group
+
+    Returns
+    -------
+    best::pd.DataFrame
+        One row per (Status, HP_Group) with BestPokeball, Efficiency and CaptureRate
+    """
+    balls = list(prices)
+    df = df[df['Pokeball'].isin(balls)]
+    means = (df.groupby(['Status', 'HP_Group', 'Pokeball'], observed=True)[value].mean()
+             .unstack('Pokeball').reindex(columns=balls))
+    capture_rates = means.to_numpy(dtype=np.float64)
+    efficiency = capture_rates / np.array([prices[ball] for ball in balls], dtype=np.float64)
+
+    best = np.where(np.isnan(efficiency), -np.inf, efficiency).argmax(axis=1)
+    rows = np.arange(len(best))
+    return pd.DataFrame({
+        'Status': means.index.get_level_values('Status'),
+        'HP_Group': means.index.get_level_values('HP_Group'),
+        'BestPokeball': np.array(balls, dtype=object)[best],
+        'Efficiency': efficiency[rows, best],
+        'CaptureRate': capture_rates[rows, best],
+    })
+
+def best_ball_cell_colors(pokeball_pivot, efficiency_pivot, pokeball_colors):
+    # Color of the best ball of every cell blended with white by its efficiency,
+    # relative to 70% of the highest one. Cells without data get NaN
+    balls = list(pokeball_colors)
+    base_colors = np.array([mcolors.to_rgb(pokeball_colors[ball]) for ball in balls])
+    best = pokeball_pivot.to_numpy(dtype=object)
+    missing = pd.isna(best)
+    codes = np.array([balls.index(ball) if not is_missing else 0
+                      for ball, is_missing in zip(best.ravel(), missing.ravel())]).reshape(best.shape)
+
+    efficiency = efficiency_pivot.to_numpy(dtype=np.float64)
+    intensity = np.minimum(1.0, efficiency / (np.nanmax(efficiency) * 0.7))[..., None]
+    colors = base_colors[codes] * intensity + (1 - intensity)
+    colors[missing] = np.nan
+    return colors
+
+def draw_best_ball_cells(ax, pokeball_pivot, efficiency_pivot, pokeball_colors):
+    colors = best_ball_cell_colors(pokeball_pivot, efficiency_pivot, pokeball_colors)
+    efficiency = efficiency_pivot.to_numpy(dtype=np.float64)
+    for i, j in zip(*np.nonzero(~np.isnan(colors[..., 0]))):
+        # Draw rectangle with white edgecolor (border) and the efficiency value
+        ax.add_patch(plt.Rectangle((j, i), 1, 1, facecolor=tuple(colors[i, j]), edgecolor='white', linewidth=1))
+        ax.text(j + 0.5, i + 0.5, f"{efficiency[i, j] * 100:.3f}",
+                ha="center", va="center", fontweight='bold')
+
+def create_efficiency_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, fixed_level=50):
+    statistics1 = capture_rate_statistics(CaptureRateMoments(fixed_level, fixed_level).update(df1).result())
+    statistics2 = capture_rate_statistics(CaptureRateMoments(fixed_level, fixed_level).update(df2).result())
+    create_efficiency_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir, fixed_level)
+
+# Takes the capture_rate_statistics of each pokemon at fixed_level instead of every row
+def create_efficiency_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir, fixed_level=50):
+    def create_efficiency_heatmap(statistics, pokemon_name, output_dir):
         os.makedirs(output_dir, exist_ok=True)
 
         pokeball_prices = {
@@ -186,126 +223,23 @@ def create_efficiency_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
 
         status_names = ["sleep", "paralysis", "poison", "freeze", "burn", "none"]
 
-        filtered_df = df[df['Level'] == fixed_level]
-
-        if filtered_df.empty:
+        if statistics.empty:
             print(f"No data available for {pokemon_name} at level {fixed_level}")
             return
 
-        hp_groups = group_hp_by_capture_rate(filtered_df, num_hp_groups)
-        filtered_df['HP_Group'] = filtered_df['HP'].map(hp_groups)
-
-        hp_group_labels = sorted(set(hp_groups.values()), 
-                                key=lambda x: float(x.split('-')[0]) if '-' in x else float(x))
-
-        best_pokeball_data = []
-
-        for status in status_names:
-            for hp_group in hp_group_labels:
-                combo_df = filtered_df[(filtered_df['HP_Group'] == hp_group) & (filtered_df['Status'] == status)]
-
-                if combo_df.empty:
-                    continue
-
-                best_efficiency_by_ball = {}
-
-                # Find the most cost-effective ball for each pokeball type
-                for pokeball in pokeball_prices.keys():
-                    ball_df = combo_df[combo_df['Pokeball'] == pokeball]
-                    if not ball_df.empty:
-                        avg_capture_rate = ball_df['CaptureRate'].mean()
-                        efficiency = avg_capture_rate / pokeball_prices[pokeball]
-                        best_efficiency_by_ball[pokeball] = {
-                            'efficiency': efficiency,
-                            'capture_rate': avg_capture_rate
-                        }
-
-                if best_efficiency_by_ball:
-                    # Find the ball with the highest efficiency
-                    best_ball = max(best_efficiency_by_ball.items(), 
-                                    key=lambda x: x[1]['efficiency'])
-
-                    best_pokeball_data.append({
-                        'Status': status,
-                        'HP_Group': hp_group,
-                        'BestPokeball': best_ball[0],
-                        'Efficiency': best_ball[1]['efficiency'],
-                        'CaptureRate': best_ball[1]['capture_rate']
-                    })
-
-        best_df = pd.DataFrame(best_pokeball_data)
-
-        pokeball_pivot = best_df.pivot_table(
-            index='Status',
-            columns='HP_Group',
-            values='BestPokeball',
-            aggfunc=lambda x: x.iloc[0] if len(x) > 0 else None
-        )
+        hp_group_labels = sort_hp_groups(statistics['HP_Group'])
 
-        efficiency_pivot = best_df.pivot_table(
-            index='Status',
-            columns='HP_Group',
-            values='Efficiency',
-            aggfunc='first'
-        )
-
-        pokeball_pivot = pokeball_pivot.reindex(status_names)
-        efficiency_pivot = efficiency_pivot.reindex(status_names)
+        best_df = best_ball_table(statistics, pokeball_prices, 'Mean')
 
-        pokeball_pivot = pokeball_pivot.reindex(columns=hp_group_labels)
-        efficiency_pivot = efficiency_pivot.reindex(columns=hp_group_labels)
+        pokeball_pivot = best_df.pivot(index='Status', columns='HP_Group', values='BestPokeball')
+        efficiency_pivot = best_df.pivot(index='Status', columns='HP_Group', values='Efficiency')
 
-        pokeball_cmap = {}
-        for pokeball, color in pokeball_colors.items():
-            pokeball_cmap[pokeball] = color
-
-        # Create a 2D array of colors based on the best pokeball
-        cell_colors = np.zeros((len(pokeball_pivot), len(pokeball_pivot.columns), 3))
-        for i, status in enumerate(pokeball_pivot.index):
-            for j, hp_group in enumerate(pokeball_pivot.columns):
-                if pd.isna(pokeball_pivot.iloc[i, j]):
-                    cell_colors[i, j] = mcolors.to_rgb('lightgray')
-                else:
-                    base_color = mcolors.to_rgb(pokeball_cmap[pokeball_pivot.iloc[i, j]])
-                    efficiency = efficiency_pivot.iloc[i, j]
-
-                    # Scale the efficiency to get color intensity
-                    # Normalize the efficiency for better visualization
-                    max_efficiency = efficiency_pivot.max().max()
-                    intensity = min(1.0, efficiency / (max_efficiency * 0.7))
-
-                    # Blend with white based on intensity
-                    white = mcolors.to_rgb('white')
-                    blended_color = tuple(base * intensity + white[i] * (1 - intensity) for i, base in enumerate(base_color))
-                    cell_colors[i, j] = blended_color
+        pokeball_pivot = pokeball_pivot.reindex(index=status_names, columns=hp_group_labels)
+        efficiency_pivot = efficiency_pivot.reindex(index=status_names, columns=hp_group_labels)
 
         fig, ax = plt.subplots(figsize=(14, 8))
 
-        # Calculate max efficiency for normalization
-        max_efficiency = efficiency_pivot.max().max()
-
-        # Draw each cell manually
-        for i in range(len(pokeball_pivot.index)):
-            for j in range(len(pokeball_pivot.columns)):
-                if not pd.isna(pokeball_pivot.iloc[i, j]):
-                    ball_type = pokeball_pivot.iloc[i, j]
-                    base_color = mcolors.to_rgb(pokeball_colors[ball_type])
-
-                    efficiency = efficiency_pivot.iloc[i, j]
-                    intensity = min(1.0, efficiency / (max_efficiency * 0.7))
-
-                    # Blend with white based on intensity
-                    white = mcolors.to_rgb('white')
-                    color = tuple(base * intensity + white[i] * (1 - intensity) for i, base in enumerate(base_color))
-
-                    # Draw rectangle with white edgecolor (border)
-                    rect = plt.Rectangle((j, i), 1, 1, facecolor=color, edgecolor='white', linewidth=1)
-                    ax.add_patch(rect)
-
-                    # Add text for efficiency value
-                    efficiency_value = efficiency_pivot.iloc[i, j] * 100
-                    ax.text(j + 0.5, i + 0.5, f"{efficiency_value:.3f}", 
-                           ha="center", va="center", fontweight='bold')
+        draw_best_ball_cells(ax, pokeball_pivot, efficiency_pivot, pokeball_colors)
 
         # Set limits and labels
         ax.set_xlim(0, len(pokeball_pivot.columns))
@@ -338,11 +272,60 @@ def create_efficiency_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
         plt.savefig(filename, dpi=300, bbox_inches='tight')
         plt.close()
 
-    create_efficiency_heatmap(df1, pokemon1, output_dir, num_hp_groups=19)
-    create_efficiency_heatmap(df2, pokemon2, output_dir, num_hp_groups=19)
+    create_efficiency_heatmap(statistics1, pokemon1, output_dir)
+    create_efficiency_heatmap(statistics2, pokemon2, output_dir)
+
+def sort_hp_groups(hp_groups):
+    return sorted(set(hp_groups), key=lambda x: float(x.split('-')[0]) if '-' in x else float(x))
+
+def capture_rate_statistics(moments, num_hp_groups=19):
+    """Shared aggregation stage of the heatmaps
+
+    Merges the moments of the HP values of each group, as returned by
+    LevelRangeMoments, into the statistics every heatmap of a level range is
+    drawn from, in a single groupby.
+
+    Parameters
+    ----------
+    moments::[pd.DataFrame]
+        count, sum, sumsq, min and max of the capture rate per (Pokeball, Status, HP)
+    num_hp_groups::[int]
+        Number of HP groups, see group_hp_by_capture_rate
+
+    Returns
+    -------
+    statistics::pd.DataFrame
+        Pokeball, Status, HP_Group, count, Mean, StdDev, Min and Max, the
+        sample standard deviation is NaN for groups of a single row
+    """
+    hp_groups = group_hp_by_capture_rate(moments, num_hp_groups)
+    totals = (moments.assign(HP_Group=moments['HP'].map(hp_groups))
+              .groupby(['Pokeball', 'Status', 'HP_Group'])
+              .agg({'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'}))
+
+    mean = totals['sum'] / totals['count']
+    variance = (totals['sumsq'] - totals['sum'] * mean) / (totals['count'] - 1).where(totals['count'] > 1)
+    return pd.DataFrame({
+        'count': totals['count'],
+        'Mean': mean,
+        'StdDev': np.sqrt(variance.clip(lower=0)),
+        'Min': totals['min'],
+        'Max': totals['max'],
+    }).reset_index()
+
+def combination_statistics(moments_by_range, num_hp_groups=19):
+    # capture_rate_statistics of every level range returned by LevelRangeMoments.results
+    return {level_range: capture_rate_statistics(moments, num_hp_groups)
+            for level_range, moments in moments_by_range.items()}
 
 def create_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
-    def create_std_dev_heatmap(df, pokemon_name, output_dir, num_hp_groups=19, cmap="YlGrBu"):
+    statistics1 = capture_rate_statistics(CaptureRateMoments(1, 100).update(df1).result())
+    statistics2 = capture_rate_statistics(CaptureRateMoments(1, 100).update(df2).result())
+    create_std_dev_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir)
+
+# Takes the capture_rate_statistics of each pokemon for levels 1-100 instead of every row
+def create_std_dev_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir):
+    def create_std_dev_heatmap(statistics, pokemon_name, output_dir, cmap="YlGrBu"):
         os.makedirs(output_dir, exist_ok=True)
  
         pokeball_colors = {
@@ -354,42 +337,12 @@ def create_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
  
         status_names = ["none", "burn", "freeze", "poison", "paralysis", "sleep"]
  
-        filtered_df = df[(df['Level'] >= 1) & (df['Level'] <= 100)]
- 
-        if filtered_df.empty:
-            print(f"No data available for {pokemon_name} at levels 1-50")
+        std_dev_df = statistics.dropna(subset=['StdDev'])  # Need at least 2 points for std dev
+        if std_dev_df.empty:
+            print(f"No data available for {pokemon_name} at levels 1-100")
             return
  
-        filtered_df = filtered_df.copy()
- 
-        hp_groups = group_hp_by_capture_rate(filtered_df, num_hp_groups)
-        filtered_df['HP_Group'] = filtered_df['HP'].map(hp_groups)
- 
-        hp_group_labels = sorted(set(hp_groups.values()), 
-                                key=lambda x: float(x.split('-')[0]) if '-' in x else float(x))
- 
-        std_dev_data = []
- 
-        for pokeball in pokeball_colors.keys():
-            for status in status_names:
-                for hp_group in hp_group_labels:
-                    combo_df = filtered_df[(filtered_df['HP_Group'] == hp_group) & 
-                                          (filtered_df['Status'] == status) &
-                                          (filtered_df['Pokeball'] == pokeball)]
- 
-                    if not combo_df.empty and len(combo_df) > 1:  # Need at least 2 points for std dev
-                        mean = combo_df['CaptureRate'].mean()
-                        std_dev = combo_df['CaptureRate'].std()
- 
-                        std_dev_data.append({
-                            'Pokeball': pokeball,
-                            'Status': status,
-                            'HP_Group': hp_group,
-                            'StdDev': std_dev,
-                            'Mean' : mean
-                        })
- 
-        std_dev_df = pd.DataFrame(std_dev_data)
+        hp_group_labels = sort_hp_groups(statistics['HP_Group'])
  
         # Create separate heatmaps for each pokeball type
         for pokeball in pokeball_colors.keys():
@@ -399,15 +352,8 @@ def create_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
                 print(f"No data available for {pokeball}")
                 continue
             
-            std_dev_pivot = pokeball_data.pivot_table(
-                index='Status',
-                columns='HP_Group',
-                values='StdDev',
-                aggfunc='first'
-            )
- 
-            std_dev_pivot = std_dev_pivot.reindex(status_names)
-            std_dev_pivot = std_dev_pivot.reindex(columns=hp_group_labels)
+            std_dev_pivot = pokeball_data.pivot(index='Status', columns='HP_Group', values='StdDev')
+            std_dev_pivot = std_dev_pivot.reindex(index=status_names, columns=hp_group_labels)
  
             plt.figure(figsize=(14, 8))
  
@@ -438,12 +384,19 @@ def create_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir):
             plt.savefig(filename, dpi=300, bbox_inches='tight')
             plt.close()
  
-    create_std_dev_heatmap(df1, pokemon1, output_dir, 19, "YlGnBu")
-    create_std_dev_heatmap(df2, pokemon2, output_dir, 19, "YlOrBr")
+    create_std_dev_heatmap(statistics1, pokemon1, output_dir, "YlGnBu")
+    create_std_dev_heatmap(statistics2, pokemon2, output_dir, "YlOrBr")
 
 def create_mean_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, first_level=1, last_level=100):
-    # Function to create and return both the heatmap and the calculated data
-    def create_std_dev_heatmap(df, pokemon_name, output_dir, num_hp_groups=19, cmap="YlGrBu"):
+    statistics1 = capture_rate_statistics(CaptureRateMoments(first_level, last_level).update(df1).result())
+    statistics2 = capture_rate_statistics(CaptureRateMoments(first_level, last_level).update(df2).result())
+    return create_mean_std_dev_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir,
+                                                        first_level, last_level)
+
+# Takes the capture_rate_statistics of each pokemon between first_level and last_level instead of every row
+def create_mean_std_dev_heatmaps_from_statistics(statistics1, statistics2, pokemon1, pokemon2, output_dir, first_level=1, last_level=100):
+    # Function to create the heatmap and return the data used for the efficiency graphs
+    def create_std_dev_heatmap(statistics, pokemon_name, output_dir, cmap="YlGrBu"):
         os.makedirs(output_dir, exist_ok=True)
         pokeball_colors = {
             "pokeball": "red",
@@ -453,35 +406,12 @@ def create_mean_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, first
         }
         status_names = ["none", "burn", "freeze", "poison", "paralysis", "sleep"]
         
-        filtered_df = df[(df['Level'] >= first_level) & (df['Level'] <= last_level)]
-        if filtered_df.empty:
-            print(f"No data available for {pokemon_name} at levels 1-50")
+        std_dev_df = statistics.dropna(subset=['StdDev'])  # Need at least 2 points for std dev
+        if std_dev_df.empty:
+            print(f"No data available for {pokemon_name} at levels {first_level}-{last_level}")
             return None
         
-        filtered_df = filtered_df.copy()
-        hp_groups = group_hp_by_capture_rate(filtered_df, num_hp_groups)
-        filtered_df['HP_Group'] = filtered_df['HP'].map(hp_groups)
-        hp_group_labels = sorted(set(hp_groups.values()), key=lambda x: float(x.split('-')[0]) if '-' in x else float(x))
-        
-        std_dev_data = []
-        for pokeball in pokeball_colors.keys():
-            for status in status_names:
-                for hp_group in hp_group_labels:
-                    combo_df = filtered_df[(filtered_df['HP_Group'] == hp_group) & 
-                                         (filtered_df['Status'] == status) & 
-                                         (filtered_df['Pokeball'] == pokeball)]
-                    if not combo_df.empty and len(combo_df) > 1:  # Need at least 2 points for std dev
-                        mean = combo_df['CaptureRate'].mean()
-                        std_dev = combo_df['CaptureRate'].std()
-                        std_dev_data.append({
-                            'Pokeball': pokeball,
-                            'Status': status,
-                            'HP_Group': hp_group,
-                            'StdDev': std_dev,
-                            'Mean': mean
-                        })
-        
-        std_dev_df = pd.DataFrame(std_dev_data)
+        hp_group_labels = sort_hp_groups(statistics['HP_Group'])
         
         # Create separate heatmaps for each pokeball type
         for pokeball in pokeball_colors.keys():
@@ -490,43 +420,19 @@ def create_mean_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, first
                 print(f"No data available for {pokeball}")
                 continue
                 
-            mean_pivot = pokeball_data.pivot_table(
-                index='Status', 
-                columns='HP_Group', 
-                values='Mean', 
-                aggfunc='first'
-            )
-            mean_pivot = mean_pivot.reindex(status_names)
-            mean_pivot = mean_pivot.reindex(columns=hp_group_labels)
-            
-            std_dev_pivot = pokeball_data.pivot_table(
-                index='Status', 
-                columns='HP_Group', 
-                values='StdDev', 
-                aggfunc='first'
-            )
-            std_dev_pivot = std_dev_pivot.reindex(status_names)
-            std_dev_pivot = std_dev_pivot.reindex(columns=hp_group_labels)
+            mean_pivot = pokeball_data.pivot(index='Status', columns='HP_Group', values='Mean')
+            mean_pivot = mean_pivot.reindex(index=status_names, columns=hp_group_labels)
+            std_dev_pivot = pokeball_data.pivot(index='Status', columns='HP_Group', values='StdDev')
+            std_dev_pivot = std_dev_pivot.reindex(index=status_names, columns=hp_group_labels)
             
-            # Combine mean and std dev in the format "mean\n±\nstd_dev"
-            combined_pivot = pd.DataFrame(index=mean_pivot.index, columns=mean_pivot.columns)
-            for idx in mean_pivot.index:
-                for col in mean_pivot.columns:
-                    if not pd.isna(mean_pivot.loc[idx, col]) and not pd.isna(std_dev_pivot.loc[idx, col]):
-                        combined_pivot.loc[idx, col] = f"{mean_pivot.loc[idx, col]:.4f}\n±\n{std_dev_pivot.loc[idx, col]:.4f}"
+            # Annotations in the format "mean\n±\nstd_dev"
+            means = mean_pivot.to_numpy(dtype=np.float64)
+            std_devs = std_dev_pivot.to_numpy(dtype=np.float64)
+            mask = np.isnan(means) | np.isnan(std_devs)
             
             plt.figure(figsize=(18, 10))  
             
-            mask = combined_pivot.isna()
-            
-            def annotate_heatmap(data, color_data, **kws):
-                yd, xd = np.meshgrid(np.arange(data.shape[0]) + 0.5, np.arange(data.shape[1]) + 0.5)
-                for y, x, val, color_val in zip(xd.flatten(), yd.flatten(), data.values.flatten(), color_data.values.flatten()):
-                    if not pd.isna(val):
-                        kws['color'] = 'white' if color_val < mean_pivot.values.flatten().max() / 2 else 'black'
-                        plt.text(y, x, val, ha="center", va="center", **kws)
-            
-            # Use standard heatmap with std_dev values for color but without annotations
+            # Use standard heatmap with mean values for color but without annotations
             ax = sns.heatmap(
                 mean_pivot,
                 cmap=cmap,
@@ -539,7 +445,10 @@ def create_mean_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, first
             )
             
             # Add custom annotations with both mean and std_dev in multiline format
-            annotate_heatmap(combined_pivot, mean_pivot, fontsize=8)
+            threshold = np.nanmax(means) / 2
+            for i, j in zip(*np.nonzero(~mask)):
+                plt.text(j + 0.5, i + 0.5, f"{means[i, j]:.4f}\n±\n{std_devs[i, j]:.4f}", ha="center", va="center",
+                         color='white' if means[i, j] < threshold else 'black', fontsize=8)
             
             plt.xticks(rotation=45, ha='right')
             plt.title(f'Precisión de captura (media ± desv. estándar) para {pokemon_name}\n {pokeball.capitalize()} - Niveles: {first_level}-{last_level}', fontsize=16)
@@ -554,8 +463,8 @@ def create_mean_std_dev_heatmaps(df1, df2, pokemon1, pokemon2, output_dir, first
         # Return the DataFrame with the calculated values to use for efficiency calculations
         return std_dev_df
     
-    data_df1 = create_std_dev_heatmap(df1, pokemon1, output_dir, 19, "YlGnBu")
-    data_df2 = create_std_dev_heatmap(df2, pokemon2, output_dir, 19, "YlOrBr")
+    data_df1 = create_std_dev_heatmap(statistics1, pokemon1, output_dir, "YlGnBu")
+    data_df2 = create_std_dev_heatmap(statistics2, pokemon2, output_dir, "YlOrBr")
     return data_df1, data_df2
 
 def create_efficiency_heatmaps_from_std_dev(std_dev_data1, std_dev_data2, pokemon1, pokemon2, output_dir, first_level=1, last_level=100):
@@ -582,93 +491,19 @@ def create_efficiency_heatmaps_from_std_dev(std_dev_data1, std_dev_data2, pokemo
 
         status_names = ["sleep", "paralysis", "poison", "freeze", "burn", "none"]
         
-        std_dev_data['Efficiency'] = std_dev_data.apply(
-            lambda row: row['Mean'] / pokeball_prices[row['Pokeball']], axis=1
-        )
-        
-        hp_group_labels = sorted(set(std_dev_data['HP_Group']), 
-                            key=lambda x: float(x.split('-')[0]) if '-' in x else float(x))
-        
-        best_pokeball_data = []
-
-        for status in status_names:
-            for hp_group in hp_group_labels:
-                combo_df = std_dev_data[(std_dev_data['HP_Group'] == hp_group) & 
-                                      (std_dev_data['Status'] == status)]
-
-                if combo_df.empty:
-                    continue
-
-                best_efficiency_by_ball = {}
-
-                for pokeball in pokeball_prices.keys():
-                    ball_df = combo_df[combo_df['Pokeball'] == pokeball]
-                    if not ball_df.empty:
-                        avg_capture_rate = ball_df['Mean'].values[0]
-                        efficiency = avg_capture_rate / pokeball_prices[pokeball]
-                        best_efficiency_by_ball[pokeball] = {
-                            'efficiency': efficiency,
-                            'capture_rate': avg_capture_rate
-                        }
-
-                if best_efficiency_by_ball:
-                    # Find the ball with the highest efficiency
-                    best_ball = max(best_efficiency_by_ball.items(), 
-                                  key=lambda x: x[1]['efficiency'])
-
-                    best_pokeball_data.append({
-                        'Status': status,
-                        'HP_Group': hp_group,
-                        'BestPokeball': best_ball[0],
-                        'Efficiency': best_ball[1]['efficiency'],
-                        'CaptureRate': best_ball[1]['capture_rate']
-                    })
-
-        best_df = pd.DataFrame(best_pokeball_data)
-
-        pokeball_pivot = best_df.pivot_table(
-            index='Status',
-            columns='HP_Group',
-            values='BestPokeball',
-            aggfunc=lambda x: x.iloc[0] if len(x) > 0 else None
-        )
+        hp_group_labels = sort_hp_groups(std_dev_data['HP_Group'])
 
-        efficiency_pivot = best_df.pivot_table(
-            index='Status',
-            columns='HP_Group',
-            values='Efficiency',
-            aggfunc='first'
-        )
+        best_df = best_ball_table(std_dev_data[std_dev_data['Status'].isin(status_names)], pokeball_prices, 'Mean')
 
-        pokeball_pivot = pokeball_pivot.reindex(status_names)
-        efficiency_pivot = efficiency_pivot.reindex(status_names)
+        pokeball_pivot = best_df.pivot(index='Status', columns='HP_Group', values='BestPokeball')
+        efficiency_pivot = best_df.pivot(index='Status', columns='HP_Group', values='Efficiency')
 
-        pokeball_pivot = pokeball_pivot.reindex(columns=hp_group_labels)
-        efficiency_pivot = efficiency_pivot.reindex(columns=hp_group_labels)
+        pokeball_pivot = pokeball_pivot.reindex(index=status_names, columns=hp_group_labels)
+        efficiency_pivot = efficiency_pivot.reindex(index=status_names, columns=hp_group_labels)
 
         fig, ax = plt.subplots(figsize=(14, 8))
 
-        max_efficiency = efficiency_pivot.max().max()
-
-        # Draw each cell manually
-        for i in range(len(pokeball_pivot.index)):
-            for j in range(len(pokeball_pivot.columns)):
-                if not pd.isna(pokeball_pivot.iloc[i, j]):
-                    ball_type = pokeball_pivot.iloc[i, j]
-                    base_color = mcolors.to_rgb(pokeball_colors[ball_type])
-
-                    efficiency = efficiency_pivot.iloc[i, j]
-                    intensity = min(1.0, efficiency / (max_efficiency * 0.7))
-
-                    white = mcolors.to_rgb('white')
-                    color = tuple(base * intensity + white[i] * (1 - intensity) for i, base in enumerate(base_color))
-
-                    rect = plt.Rectangle((j, i), 1, 1, facecolor=color, edgecolor='white', linewidth=1)
-                    ax.add_patch(rect)
-
-                    efficiency_value = efficiency_pivot.iloc[i, j] * 100
-                    ax.text(j + 0.5, i + 0.5, f"{efficiency_value:.3f}", 
-                           ha="center", va="center", fontweight='bold')
+        draw_best_ball_cells(ax, pokeball_pivot, efficiency_pivot, pokeball_colors)
 
         ax.set_xlim(0, len(pokeball_pivot.columns))
         ax.set_ylim(0, len(pokeball_pivot.index))
@@ -702,46 +537,74 @@ def create_efficiency_heatmaps_from_std_dev(std_dev_data1, std_dev_data2, pokemo
     create_efficiency_heatmap_from_means(std_dev_data1, pokemon1, output_dir, num_hp_groups=19)
     create_efficiency_heatmap_from_means(std_dev_data2, pokemon2, output_dir, num_hp_groups=19)
 
+# Level ranges of the 2d and 2e graphs, aggregated together in a single pass
+LEVEL_RANGES = [(50, 50), (1, 100), (1, 50), (51, 100)]
+
+def dataset_moments(dataset, pokemon_name, stream=False):
+    # LevelRangeMoments of a species of a CombinationDataset, one chunk at a time when streaming
+    accumulator = LevelRangeMoments(LEVEL_RANGES)
+    chunks = dataset.iter_species(pokemon_name)
+    for chunk in (chunks if stream else [pd.concat(chunks, ignore_index=True)]):
+        accumulator.update(chunk)
+    return accumulator.results()
+
 # First run ./utils/all_combination_of_properties_generator.py with the same pokemons selected
-def main():
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <first_pokemon> <second_pokemon>")
-        print("Example: python3 visualize_best_combination_of_properties_per_ball.py snorlax caterpie")
-        sys.exit(1)
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        epilog="Example: python3 visualize_best_combination_of_properties_per_ball.py snorlax caterpie")
+    parser.add_argument("first_pokemon")
+    parser.add_argument("second_pokemon")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the files in chunks with bounded memory instead of loading them whole")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes rendering the graphs (default: one per CPU)")
+    parser.add_argument("--dataset", default=None, metavar="DIR",
+                        help="read the pokemon from a dataset written by the generator with --checkpoint DIR")
+    args = parser.parse_args(argv)
     
-    first_pokemon = sys.argv[1]
-    second_pokemon = sys.argv[2]
-
-    file_path1 = f"{first_pokemon}_conditions_combination.txt"
-    file_path2 = f"{second_pokemon}_conditions_combination.txt"
+    first_pokemon = args.first_pokemon
+    second_pokemon = args.second_pokemon
 
     try:
-        # Parse the data files
-        df1 = parse_pokemon_file(file_path1)
-        df2 = parse_pokemon_file(file_path2)
+        # Every graph is drawn from the statistics of its level range, computed once per pokemon
+        if args.dataset:
+            moments1 = dataset_moments(CombinationDataset(args.dataset), first_pokemon, args.stream)
+            moments2 = dataset_moments(CombinationDataset(args.dataset), second_pokemon, args.stream)
+        elif args.stream:
+            moments1 = aggregate_combinations(pokemon_data_path(first_pokemon), LEVEL_RANGES)
+            moments2 = aggregate_combinations(pokemon_data_path(second_pokemon), LEVEL_RANGES)
+        else:
+            moments1 = LevelRangeMoments(LEVEL_RANGES).update(load_pokemon_data(first_pokemon)).results()
+            moments2 = LevelRangeMoments(LEVEL_RANGES).update(load_pokemon_data(second_pokemon)).results()
+        statistics1 = combination_statistics(moments1)
+        statistics2 = combination_statistics(moments2)
 
         # Create output directory
         output_dir = "combination_of_properties_graphs"
         os.makedirs(output_dir, exist_ok=True)
 
-        # Create plots
-        # 2d
-        # in all functions the fixed level is already set
-        create_capture_rate_heatmaps(df1,df2,first_pokemon, second_pokemon, output_dir)
-
-        create_bar_plot_for_pokemon_prices(output_dir)
-        
-        create_efficiency_heatmaps(df1,df2, first_pokemon, second_pokemon, output_dir)
-
-        # 2e
-        # fixed for levels 1-100
-        create_std_dev_heatmaps(df1, df2, first_pokemon, second_pokemon, output_dir)
-
-        # for the following functions if limits are not passed, the default range is 1-100
-        std_dev_data1_low, std_dev_data2_low = create_mean_std_dev_heatmaps(df1, df2, first_pokemon, second_pokemon, output_dir, 1, 50)
-        std_dev_data1_high, std_dev_data2_high = create_mean_std_dev_heatmaps(df1, df2, first_pokemon, second_pokemon, output_dir, 51, 100)
-        create_efficiency_heatmaps_from_std_dev(std_dev_data1_low, std_dev_data2_low, first_pokemon, second_pokemon, output_dir, 1, 50)
-        create_efficiency_heatmaps_from_std_dev(std_dev_data1_high, std_dev_data2_high, first_pokemon, second_pokemon, output_dir, 51, 100)
+        def pokemons(level_range):
+            return statistics1[level_range], statistics2[level_range], first_pokemon, second_pokemon, output_dir
+
+        # The efficiency graphs of 2e only use the groups with a standard deviation
+        def with_std_dev(level_range):
+            return tuple(statistics.dropna(subset=['StdDev']) for statistics in pokemons(level_range)[:2])
+
+        # Create plots, every group of graphs is rendered in its own process
+        render_figures([
+            # 2d
+            FigureJob(create_capture_rate_heatmaps_from_statistics, pokemons((50, 50)) + (50,)),
+            FigureJob(create_bar_plot_for_pokemon_prices, (output_dir,)),
+            FigureJob(create_efficiency_heatmaps_from_statistics, pokemons((50, 50)) + (50,)),
+            # 2e
+            FigureJob(create_std_dev_heatmaps_from_statistics, pokemons((1, 100))),
+            FigureJob(create_mean_std_dev_heatmaps_from_statistics, pokemons((1, 50)) + (1, 50)),
+            FigureJob(create_mean_std_dev_heatmaps_from_statistics, pokemons((51, 100)) + (51, 100)),
+            FigureJob(create_efficiency_heatmaps_from_std_dev,
+                      with_std_dev((1, 50)) + (first_pokemon, second_pokemon, output_dir, 1, 50)),
+            FigureJob(create_efficiency_heatmaps_from_std_dev,
+                      with_std_dev((51, 100)) + (first_pokemon, second_pokemon, output_dir, 51, 100)),
+        ], args.workers)
     
     except Exception as e:
         import traceback